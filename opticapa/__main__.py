@@ -7,8 +7,23 @@ from opticapa.shared.config.config import settings
 
 
 def run_local(port=settings.server_port):
+    """
+    Serves the application with uvicorn, using uvloop and httptools when they are installed.
+    Outside production, the application is reloaded on code changes. uvicorn can't reload several worker processes :
+    the application is then served by a single process, settings.workers only being used in production.
+    Args:
+        port: port on which the application is served
+    """
+    reload = settings.environment != "production"
     uvicorn.run(
-        "opticapa.main:app", port=port, reload=True, log_level=settings.loglevel
+        "opticapa.main:app",
+        port=port,
+        reload=reload,
+        workers=None if reload else settings.workers,
+        loop="auto",
+        http="auto",
+        access_log=False,
+        log_level=settings.loglevel,
     )
 
 
@@ -1,4 +1,6 @@
-from fastapi import APIRouter, Depends, status
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Query, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from opticapa.features.axe_ef.schemas import (
@@ -11,21 +13,33 @@ from opticapa.shared.common.api_helpers import (
     CreatedResponse,
     DeletedResponse,
     UpdatedResponse,
-    PaginationParams,
+    KeysetPaginationParams,
 )
+from opticapa.shared.common.auth import get_current_user_id
 from opticapa.shared.database.manage_db import get_sync_session, get_async_session
 
+# Endpoints using a sync Session are declared with `def` so FastAPI runs them in its threadpool.
+# Only endpoints using an AsyncSession all along the call chain may be declared with `async def`.
 axe_ef_router = APIRouter(prefix="/axe_ef", tags=["axe_ef"])
 
 
-@axe_ef_router.get("/all/", response_model=PaginationAxeEf)
+# The page is returned already serialized : response_model is only used to document it
+# FastAPI only flattens a query parameters model into query parameters when it is the only query parameter
+@axe_ef_router.get(
+    "/all/", response_model=None, responses={200: {"model": PaginationAxeEf}}
+)
 def get_all_paginated_axes_ef(
+    pagination: Annotated[KeysetPaginationParams, Query()],
     session: Session = Depends(get_sync_session),
-):
-    axes_ef, count = AxeEfService.get_all_axes_ef(
-        session=session
+) -> Response:
+    page = AxeEfService.get_all_axes_ef_json(
+        session=session,
+        pagination_params=pagination,
+        after_libelle=pagination.after_libelle,
+        after_id=pagination.after_id,
+        include_total=pagination.include_total,
     )
-    return PaginationAxeEf(items=axes_ef, count=count)
+    return Response(content=page, media_type="application/json")
 
 
 @axe_ef_router.get("/{axe_ef_id}", response_model=AxeEfGet)
@@ -36,7 +50,7 @@ def get_axe_ef_by_id(axe_ef_id: str, session: Session = Depends(get_sync_session
 @axe_ef_router.post(
     "", status_code=status.HTTP_201_CREATED, response_model=CreatedResponse
 )
-async def create_axe_ef(
+def create_axe_ef(
     request: AxeEfCreateUpdate,
     session: Session = Depends(get_sync_session),
 ):
@@ -50,7 +64,7 @@ async def create_axe_ef(
     response_model=UpdatedResponse,
     status_code=status.HTTP_200_OK,
 )
-async def update_axe_ef(
+def update_axe_ef(
     axe_ef_id: str,
     request: AxeEfCreateUpdate,
     session: Session = Depends(get_sync_session),
@@ -67,7 +81,7 @@ async def update_axe_ef(
     response_model=DeletedResponse,
     status_code=status.HTTP_200_OK,
 )
-async def delete_axe_ef(
+def delete_axe_ef(
     axe_ef_id: str,
     session: Session = Depends(get_sync_session),
 ):
@@ -78,10 +92,12 @@ async def delete_axe_ef(
 async def renew_axe_ef(
     axe_ef_id: str,
     service_annuel_id: str,
+    user_id: int = Depends(get_current_user_id),
     session: AsyncSession = Depends(get_async_session),
 ):
     return await AxeEfService.renew_axe_ef(
         axe_ef_id=axe_ef_id,
         service_annuel_id=service_annuel_id,
+        user_id=user_id,
         session=session,
     )
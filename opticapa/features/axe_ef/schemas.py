@@ -1,7 +1,10 @@
 from datetime import datetime
 from typing import Optional
+from uuid import UUID
 
+from opticapa_models import SectionAxe
 from opticapa_models.infrastructure.enums import NatureAxeEf
+from pydantic import Field, field_validator
 
 from opticapa.shared.common.base_model import BaseModel
 from opticapa.shared.common.schemas.common import ObjectGetAll
@@ -23,7 +26,23 @@ class AxeEfCreateUpdate(AxeEfProto, GetColoredSimpleObj):
 
 
 class AxeEfGet(AxeEfProto, GetIdentifiedSimpleObj):
-    section_axes: list[SectionAxeProto]
+    # Read from the ORM relationship when validating an AxeEf, still serialized as section_axes
+    section_axes: list[SectionAxeProto] = Field(validation_alias="sections")
+
+    @field_validator("section_axes", mode="before")
+    @classmethod
+    def construct_section_axes(cls, sections: list) -> list:
+        # Sections loaded from db are trusted, they are built without being validated again
+        return [
+            SectionAxeProto.model_construct(
+                onb_tcap=section.onb_tcap,
+                libelle=section.libelle,
+                service_annuel_id=section.service_annuel_id,
+            )
+            if isinstance(section, SectionAxe)
+            else section
+            for section in sections
+        ]
 
 
 class AxeEfGetAll(GetIdentifiedSimpleObj, ObjectGetAll):
@@ -31,6 +50,13 @@ class AxeEfGetAll(GetIdentifiedSimpleObj, ObjectGetAll):
     updated_at: datetime
 
 
+class AxeEfCursor(BaseModel):
+    libelle: str
+    id: UUID
+
+
 class PaginationAxeEf(BaseModel):
     items: list[AxeEfGetAll]
-    count: int
\ No newline at end of file
+    has_next: bool
+    count: Optional[int] = None
+    next_cursor: Optional[AxeEfCursor] = None
\ No newline at end of file
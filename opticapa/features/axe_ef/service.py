@@ -1,27 +1,114 @@
-from datetime import datetime
-from typing import Any
+from itertools import islice
+from threading import Lock
+from typing import Any, Iterable, Iterator, Optional
 from uuid import uuid4, UUID
 
+from cachetools import TTLCache
+from cachetools.keys import hashkey
 from fastapi import HTTPException, status
+from pydantic import TypeAdapter
 from opticapa_models import (
     SectionAxe,
     ServiceAnnuel,
 )
 from opticapa_models.infrastructure.models.axe_ef import AxeEf
-from sqlalchemy import select, func, case
+from sqlalchemy import (
+    RowMapping,
+    Select,
+    inspect,
+    select,
+    func,
+    lambda_stmt,
+    true,
+    tuple_,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, selectinload
 from opticapa_models.infrastructure.models.axe_ef import AxeEfSection
 from opticapa_models.infrastructure.models.sections import LvpkSectionAxe
 
 from opticapa.features.axe_ef.schemas import (
+    AxeEfCursor,
     AxeEfGet,
     AxeEfGetAll,
     AxeEfCreateUpdate,
-    SectionAxeProto
+    PaginationAxeEf,
 )
 from opticapa.shared.common import api_helpers
-from opticapa.shared.common.service.crud import OrmCrudSyncService
-from opticapa.shared.common.service import verify_existence_and_get
+from opticapa.shared.common.service.crud import OrmCrudAsyncService, OrmCrudSyncService
+from opticapa.shared.common.service import (
+    async_verify_existence_and_get,
+    verify_existence_and_get,
+    with_raiseload,
+)
+
+# Pages of axes EF already serialized into JSON, cleared on any write on axes EF.
+# Each worker process has its own cache : a write only clears the cache of the worker handling it, other workers
+# serving their cached pages until the TTL expires.
+_axes_ef_pages_cache: TTLCache = TTLCache(maxsize=64, ttl=30)
+_axes_ef_pages_cache_lock = Lock()
+# Incremented on each clear, so that a page read before a write isn't cached after the clear following this write
+_axes_ef_pages_cache_generation = 0
+# Validates a whole list of axes EF in a single call
+_LIST_ADAPTER = TypeAdapter(list[AxeEfGetAll])
+# Columns of an axe EF which aren't copied when renewing it on another service annuel
+_RENEW_EXCLUDED_COLUMNS = (
+    "id",
+    "service_annuel_id",
+    "created_at",
+    "created_by",
+    "modified_at",
+    "modified_by",
+)
+
+
+def _select_all_axes_ef() -> Select:
+    """
+    Builds the query of all axes EF with their lvpks, sorted by libelle then id.
+    It is only called when building the lambda statements of AxeEfService.get_all_axes_ef, whose compiled SQL is
+    cached by SQLAlchemy.
+    """
+    # Lvpks are aggregated per axe EF in a lateral subquery, so that axes EF are scanned once
+    # without grouping the whole joined result
+    lvpks_subquery = (
+        select(
+            func.jsonb_agg(
+                func.jsonb_build_object(
+                    "ligne",
+                    LvpkSectionAxe.ligne,
+                    "voie",
+                    LvpkSectionAxe.voie,
+                    "pk_debut",
+                    LvpkSectionAxe.pk_debut,
+                    "pk_fin",
+                    LvpkSectionAxe.pk_fin,
+                )
+            ).label("lvpks")
+        )
+        .select_from(AxeEfSection)
+        .join(
+            LvpkSectionAxe,
+            LvpkSectionAxe.section_axe_onb == AxeEfSection.section_axe_onb,
+        )
+        .where(AxeEfSection.axe_ef_id == AxeEf.id)
+        .lateral("axe_ef_lvpks")
+    )
+    return (
+        select(
+            AxeEf.id,
+            AxeEf.libelle,
+            AxeEf.color,
+            AxeEf.nature,
+            AxeEf.description,
+            func.coalesce(AxeEf.modified_at, AxeEf.created_at).label("updated_at"),
+            lvpks_subquery.c.lvpks,
+        )
+        .select_from(AxeEf)
+        .outerjoin(lvpks_subquery, true())
+        # Axes EF without any lvpk are left out, as with the former inner joins
+        .where(lvpks_subquery.c.lvpks.is_not(None))
+        .order_by(AxeEf.libelle, AxeEf.id)
+    )
 
 
 class AxeEfService:
@@ -42,93 +129,159 @@ class AxeEfService:
             object_id=axe_ef_id,
             model=AxeEf,
             db=session,
-            load_options=[selectinload(AxeEf.sections)],
+            load_options=with_raiseload(selectinload(AxeEf.sections)),
         )
-        section_axes = [SectionAxeProto(**sec.__dict__) for sec in axe_ef.sections]
-        res = AxeEfGet(
-            id=axe_ef.id,
-            libelle=axe_ef.libelle,
-            description=axe_ef.description,
-            nature=axe_ef.nature,
-            color=axe_ef.color,
-            service_annuel_id=axe_ef.service_annuel_id,
-            section_axes=section_axes,
-        )
-        return res
+        return AxeEfGet.model_validate(axe_ef)
 
     @classmethod
     def get_all_axes_ef(
         cls,
-        session: Session
-    ) -> tuple[list[AxeEfGetAll], int]:
+        session: Session,
+        pagination_params: Optional[api_helpers.PaginationParams] = None,
+        after_libelle: Optional[str] = None,
+        after_id: Optional[UUID] = None,
+        include_total: bool = False,
+    ) -> PaginationAxeEf:
         """
-        Gets all axes EF from database, and sorts them by sort_category according to the given sort order.
-        If search_string is not None, axes EF are filtered by matching libelle.
+        Gets all axes EF from database, sorted by libelle then id.
         If pagination_params is not None, the result of query is limited.
+        If after_libelle and after_id are given, axes EF are paginated by keyset : only the axes EF following this
+        cursor are returned, the offset is ignored and the total number of axes EF is not computed.
 
         Args:
             session: db session
-            service_annuel_id: id of service annuel filtering axes EF
-            search_string: string filtering axes EF by libelle
-            sort_category: Column to be sorted with
-            sort: Sort the results in ascending or descending order
             pagination_params: contains the limit and offset for the sql query
+            after_libelle: libelle of the last axe EF of the previous page
+            after_id: id of the last axe EF of the previous page
+            include_total: if True, the total number of axes EF is computed (ignored when paginating by keyset)
 
         Returns:
-            a tuple with :
+            a PaginationAxeEf with :
             - the list of axes EF limited by pagination_params, formatted into AxeEfGetAll
-            - the total number of axes EF
+            - whether there is a next page
+            - the total number of axes EF, None if not requested or when paginating by keyset
+            - the cursor of the next page, if there is one
 
         """
-        get_all_query = (
-            select(
-                AxeEf.id,
-                AxeEf.libelle,
-                AxeEf.color,
-                AxeEf.nature,
-                AxeEf.description,
-                case(
-                    (AxeEf.modified_at.is_not(None), AxeEf.modified_at),
-                    else_=AxeEf.created_at,
-                ).label("updated_at"),
-                func.json_agg(
-                    func.json_build_object(
-                        "ligne",
-                        LvpkSectionAxe.ligne,
-                        "voie",
-                        LvpkSectionAxe.voie,
-                        "pk_debut",
-                        LvpkSectionAxe.pk_debut,
-                        "pk_fin",
-                        LvpkSectionAxe.pk_fin,
-                    )
-                ).label("lvpks"),
+        keyset_mode = after_libelle is not None and after_id is not None
+        with_total = include_total and not keyset_mode
+        # Each lambda is compiled once and then cached, values from the closure being bound as parameters
+        if with_total:
+            # Total is computed on the same scan, before limit/offset
+            get_all_query = lambda_stmt(
+                lambda: _select_all_axes_ef().add_columns(
+                    func.count().over().label("total")
+                )
             )
-            .join(AxeEfSection, AxeEfSection.axe_ef_id == AxeEf.id)
-            .join(
-                LvpkSectionAxe,
-                LvpkSectionAxe.section_axe_onb == AxeEfSection.section_axe_onb,
+        else:
+            get_all_query = lambda_stmt(lambda: _select_all_axes_ef())
+        if keyset_mode:
+            get_all_query += lambda s: s.where(
+                tuple_(AxeEf.libelle, AxeEf.id) > tuple_(after_libelle, after_id)
             )
-            .group_by(
-                AxeEf.id,
-                AxeEf.libelle,
-                AxeEf.color,
-                AxeEf.nature,
-                AxeEf.created_at,
-                AxeEf.modified_at,
+        if pagination_params:
+            # One more axe EF is fetched to know whether there is a next page
+            fetch_limit = pagination_params.limit + 1
+            get_all_query += lambda s: s.limit(fetch_limit)
+            if not keyset_mode:
+                offset = pagination_params.offset
+                get_all_query += lambda s: s.offset(offset)
+
+        # Pages hold at most 1001 rows : they are fetched at once, a server side cursor (yield_per) only adding
+        # round trips. Rows are validated straight from the result, without building an intermediate list.
+        rows = session.execute(get_all_query).mappings()
+        page_bounds: dict[str, RowMapping] = {}
+
+        def track_page_bounds(axes_ef: Iterable[RowMapping]) -> Iterator[RowMapping]:
+            for axe_ef in axes_ef:
+                page_bounds.setdefault("first", axe_ef)
+                page_bounds["last"] = axe_ef
+                yield axe_ef
+
+        try:
+            page_rows = (
+                islice(rows, pagination_params.limit) if pagination_params else rows
+            )
+            formatted_axes_ef = _LIST_ADAPTER.validate_python(
+                track_page_bounds(page_rows)
+            )
+            has_next = bool(pagination_params) and rows.fetchone() is not None
+        finally:
+            rows.close()
+
+        next_cursor = None
+        if has_next:
+            next_cursor = AxeEfCursor(
+                libelle=page_bounds["last"]["libelle"], id=page_bounds["last"]["id"]
             )
-            .order_by(AxeEf.libelle)
+        count = None
+        if with_total:
+            count = page_bounds["first"]["total"] if page_bounds else 0
+        return PaginationAxeEf(
+            items=formatted_axes_ef,
+            has_next=has_next,
+            count=count,
+            next_cursor=next_cursor,
         )
 
-        count_query = select(func.count(AxeEf.id))
-        axes_ef = session.execute(get_all_query).mappings().all()
+    @classmethod
+    def get_all_axes_ef_json(
+        cls,
+        session: Session,
+        pagination_params: Optional[api_helpers.PaginationParams] = None,
+        after_libelle: Optional[str] = None,
+        after_id: Optional[UUID] = None,
+        include_total: bool = False,
+    ) -> str:
+        """
+        Gets all axes EF from database like get_all_axes_ef, serialized into JSON.
+        Serialized pages are cached for a short time, the cache being cleared on any write on axes EF handled by this
+        worker process. Other workers keep serving their cached pages until the TTL expires.
 
-        count = session.execute(count_query).scalars().first()
-        formatted_axes_ef = [
-            AxeEfGetAll.model_validate(axe_ef)
-            for axe_ef in axes_ef
-        ]
-        return formatted_axes_ef, count
+        Args:
+            session: db session
+            pagination_params: contains the limit and offset for the sql query
+            after_libelle: libelle of the last axe EF of the previous page
+            after_id: id of the last axe EF of the previous page
+            include_total: if True, the total number of axes EF is computed (ignored when paginating by keyset)
+
+        Returns:
+            the PaginationAxeEf returned by get_all_axes_ef, serialized into JSON
+
+        """
+        key = hashkey(
+            pagination_params.limit if pagination_params else None,
+            pagination_params.offset if pagination_params else None,
+            after_libelle,
+            after_id,
+            include_total,
+        )
+        with _axes_ef_pages_cache_lock:
+            page = _axes_ef_pages_cache.get(key)
+            generation = _axes_ef_pages_cache_generation
+        if page is None:
+            page = cls.get_all_axes_ef(
+                session=session,
+                pagination_params=pagination_params,
+                after_libelle=after_libelle,
+                after_id=after_id,
+                include_total=include_total,
+            ).model_dump_json()
+            with _axes_ef_pages_cache_lock:
+                # The cache was cleared while reading : the page may predate the write which cleared it
+                if generation == _axes_ef_pages_cache_generation:
+                    _axes_ef_pages_cache[key] = page
+        return page
+
+    @staticmethod
+    def clear_axes_ef_cache():
+        """
+        Clears cached pages of axes EF of this worker process. Must be called after any write on axes EF is committed.
+        """
+        global _axes_ef_pages_cache_generation
+        with _axes_ef_pages_cache_lock:
+            _axes_ef_pages_cache_generation += 1
+            _axes_ef_pages_cache.clear()
 
     @staticmethod
     def _validate_sections(sections_axes: list[SectionAxe], service_annuel_id: str):
@@ -151,6 +304,24 @@ class AxeEfService:
                 f"Please select valid sections on this SA",
             )
 
+    @staticmethod
+    def _is_unchanged(axe_ef: AxeEf, request: AxeEfCreateUpdate) -> bool:
+        """
+        Checks whether an update request would leave an axe EF unchanged
+        Args:
+            axe_ef: axe EF to update, with its sections loaded
+            request: parameters of the axe EF update
+
+        Returns:
+            True if every parameter of the request, and its sections, match the axe EF
+        """
+        parameters = request.model_dump(exclude={"section_axe_onbs"})
+        return all(
+            getattr(axe_ef, parameter) == value for parameter, value in parameters.items()
+        ) and set(request.section_axe_onbs) == {
+            section.onb_tcap for section in axe_ef.sections
+        }
+
     @classmethod
     def _make_axe_ef(
         cls,
@@ -174,6 +345,7 @@ class AxeEfService:
             object_id=axe_ef.service_annuel_id,
             model=ServiceAnnuel,
             db=session,
+            load_options=with_raiseload(),
             return_model=False,
         )
 
@@ -185,6 +357,7 @@ class AxeEfService:
             model=SectionAxe,
             db=session,
             model_column_id=SectionAxe.onb_tcap,
+            load_options=with_raiseload(),
             return_model=True,
         )
         cls._validate_sections(
@@ -192,12 +365,12 @@ class AxeEfService:
         )
         axe_ef_dict["sections"] = sections_axes
 
-        # Fills dates
+        # Fills dates, stamped by the database within the INSERT/UPDATE
         if is_new:
-            axe_ef_dict["created_at"] = datetime.now()
+            axe_ef_dict["created_at"] = func.now()
             axe_ef_dict["created_by"] = user_id
         else:
-            axe_ef_dict["modified_at"] = datetime.now()
+            axe_ef_dict["modified_at"] = func.now()
             axe_ef_dict["modified_by"] = user_id
 
         return axe_ef_dict
@@ -227,6 +400,7 @@ class AxeEfService:
             ),
         )
         OrmCrudSyncService.create_procedure(db_object=axe_ef, session=session)
+        cls.clear_axes_ef_cache()
         return api_helpers.CreatedResponse(created=axe_ef.id)
 
     @classmethod
@@ -249,9 +423,15 @@ class AxeEfService:
         Returns:
             API response making sure the resource has been updated
         """
-        axe_ef_to_update = verify_existence_and_get(
-            object_id=axe_ef_id, model=AxeEf, db=session
+        axe_ef_to_update: AxeEf = verify_existence_and_get(
+            object_id=axe_ef_id,
+            model=AxeEf,
+            db=session,
+            load_options=[selectinload(AxeEf.sections)],
         )
+        # Identical payloads are common with idempotent clients : nothing is checked nor written for them
+        if cls._is_unchanged(axe_ef=axe_ef_to_update, request=request):
+            return api_helpers.UpdatedResponse(updated=axe_ef_to_update.id)
         axe_ef = AxeEf(
             id=axe_ef_id,
             **cls._make_axe_ef(
@@ -263,6 +443,7 @@ class AxeEfService:
             db_object=axe_ef,
             session=session,
         )
+        cls.clear_axes_ef_cache()
         return api_helpers.UpdatedResponse(updated=axe_ef.id)
 
     @classmethod
@@ -280,4 +461,80 @@ class AxeEfService:
             object_id=axe_ef_id, model=AxeEf, db=session, return_model=True
         )
         OrmCrudSyncService.delete_procedure(db_object=axe_ef, session=session)
+        cls.clear_axes_ef_cache()
         return api_helpers.DeletedResponse(deleted=axe_ef_id)
+
+    @classmethod
+    async def renew_axe_ef(
+        cls,
+        axe_ef_id: str | UUID,
+        service_annuel_id: str,
+        user_id: int,
+        session: AsyncSession,
+    ) -> api_helpers.CreatedResponse:
+        """
+        Copies an axe EF on another service annuel. Its sections are replaced by the sections axes of this service
+        annuel with the same TCAP ids.
+        Args:
+            axe_ef_id: id of the axe EF to renew
+            service_annuel_id: id of the service annuel on which the axe EF is renewed
+            user_id: id of the user who's renewing the resource
+            session: db AsyncSession
+
+        Returns:
+            API response making sure the renewed axe EF has been added
+        """
+        axe_ef: AxeEf = await async_verify_existence_and_get(
+            object_id=axe_ef_id,
+            model=AxeEf,
+            db=session,
+            load_options=with_raiseload(selectinload(AxeEf.sections)),
+        )
+        await async_verify_existence_and_get(
+            object_id=service_annuel_id,
+            model=ServiceAnnuel,
+            db=session,
+            return_model=False,
+        )
+
+        sections_onbs = {section_axe.onb_tcap for section_axe in axe_ef.sections}
+        result = await session.execute(
+            select(SectionAxe)
+            .where(
+                SectionAxe.onb_tcap.in_(sections_onbs),
+                SectionAxe.service_annuel_id == service_annuel_id,
+            )
+            .options(*with_raiseload())
+        )
+        sections_axes = result.scalars().all()
+        missing_onbs = sections_onbs - {
+            section_axe.onb_tcap for section_axe in sections_axes
+        }
+        if missing_onbs:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"TCAP sections axes {sorted(missing_onbs)} don't exist on the specified SA "
+                f"{service_annuel_id}.\nPlease renew the axe EF on another SA",
+            )
+        cls._validate_sections(
+            sections_axes=sections_axes, service_annuel_id=service_annuel_id
+        )
+
+        renewed_axe_ef_id = uuid4()
+        renewed_axe_ef = AxeEf(
+            id=renewed_axe_ef_id,
+            service_annuel_id=service_annuel_id,
+            sections=sections_axes,
+            created_at=func.now(),
+            created_by=user_id,
+            **{
+                column_property.key: getattr(axe_ef, column_property.key)
+                for column_property in inspect(AxeEf).column_attrs
+                if column_property.key not in _RENEW_EXCLUDED_COLUMNS
+            },
+        )
+        await OrmCrudAsyncService.create_procedure(
+            db_object=renewed_axe_ef, session=session
+        )
+        cls.clear_axes_ef_cache()
+        return api_helpers.CreatedResponse(created=renewed_axe_ef_id)
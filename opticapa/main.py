@@ -1,9 +1,14 @@
+from contextlib import asynccontextmanager
+
+import anyio.to_thread
 from fastapi import APIRouter, FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
 from opticapa.features.axe_ef.router import axe_ef_router
 from opticapa.features.probes_routes.router import probe_router
 from opticapa.shared.config.config import settings
+from opticapa.shared.database.manage_db import warm_up_async_pool
 
 docs_url_dict = dict(
     docs_url="/api/docs", redoc_url="/api/redoc", openapi_url="/api/openapi.json"
@@ -11,6 +16,22 @@ docs_url_dict = dict(
 if settings.environment == "production":
     docs_url_dict = {"openapi_url": None, "docs_url": None, "redoc_url": None}
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Startup and shutdown of the application.
+    On startup, the threadpool running sync endpoints (40 threads by default) is sized to the sync DB connection
+    pool, so that concurrent sync endpoints neither exceed nor underuse the pool, and the async connection pool is
+    filled beforehand.
+    """
+    anyio.to_thread.current_default_thread_limiter().total_tokens = (
+        settings.db_pool_size + settings.db_max_overflow
+    )
+    await warm_up_async_pool()
+    yield
+
+
 app = FastAPI(
     title="Opticapa api services",
     docs_url=docs_url_dict["docs_url"],
@@ -18,6 +39,8 @@ app = FastAPI(
     openapi_url=docs_url_dict["openapi_url"],
     description="Welcome to Opticapa API Documentation",
     version="0.7.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 
 
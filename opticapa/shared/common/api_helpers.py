@@ -1,5 +1,8 @@
 import uuid
 from typing import Optional
+
+from pydantic import Field, model_validator
+
 from opticapa.shared.common.base_model import BaseModel
 
 
@@ -24,3 +27,21 @@ class DeletedResponse(BaseModel):
 
 class MultipleDeletedResponse(BaseModel):
     deleted: list[uuid.UUID]
+
+
+class PaginationParams(BaseModel):
+    limit: int = Field(default=25, gt=0, le=1000)
+    offset: int = Field(default=0, ge=0)
+
+
+class KeysetPaginationParams(PaginationParams):
+    # Keyset cursor : libelle and id of the last object of the previous page, given together or not at all
+    after_libelle: Optional[str] = None
+    after_id: Optional[uuid.UUID] = None
+    include_total: bool = False
+
+    @model_validator(mode="after")
+    def check_cursor(self) -> "KeysetPaginationParams":
+        if (self.after_libelle is None) != (self.after_id is None):
+            raise ValueError("after_libelle and after_id must be given together")
+        return self
@@ -0,0 +1,34 @@
+from typing import Annotated
+
+import jwt
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+from opticapa.shared.config.config import settings
+
+_bearer_scheme = HTTPBearer()
+
+
+def get_current_user_id(
+    credentials: Annotated[HTTPAuthorizationCredentials, Depends(_bearer_scheme)],
+) -> int:
+    """
+    Reads the id of the user sending the request from the subject of its access token
+    Args:
+        credentials: bearer token of the request
+
+    Returns: id of the current user
+    """
+    try:
+        payload = jwt.decode(
+            credentials.credentials,
+            settings.jwt_secret_key,
+            algorithms=[settings.algorithm],
+        )
+        return int(payload["sub"])
+    except (jwt.InvalidTokenError, KeyError, ValueError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid access token",
+            headers={"WWW-Authenticate": "Bearer"},
+        ) from e
@@ -1,4 +1,6 @@
 from opticapa.shared.common.service.crud.crud_verify_existence import (
+    DEFAULT_LOAD_OPTIONS,
     async_verify_existence_and_get,
     verify_existence_and_get,
+    with_raiseload,
 )  # noqa
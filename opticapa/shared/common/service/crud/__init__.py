@@ -1,3 +1,6 @@
 from opticapa.shared.common.service.crud.crud_sync_service import (
     OrmCrudSyncService,
+)  # noqa
+from opticapa.shared.common.service.crud.crud_async_service import (
+    OrmCrudAsyncService,
 )  # noqa
\ No newline at end of file
@@ -0,0 +1,419 @@
+import uuid
+from typing import Union, Optional, Type, Any, Callable
+
+import sqlalchemy as sqla
+from fastapi import HTTPException
+from opticapa_models import (
+    Alternat,
+    Fenetre,
+    GroupementVoies,
+    RegleAlternat,
+    PeriodeExclusion,
+    ServiceAnnuel,
+)
+from opticapa_models.infrastructure.models.axe_ef import AxeEf
+from sqlalchemy import Column
+from sqlalchemy.dialects.postgresql import insert, Insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette import status
+
+from opticapa.shared.common.enums import CrudOperation
+from opticapa.shared.database.base import Base
+from opticapa.shared.utils.logger import logger
+from opticapa.shared.common.service.crud.crud_errors import translate_integrity_error
+from opticapa.shared.common.service.crud.crud_statements import (
+    build_insert_stmt,
+    build_update_statements,
+    group_insert_rows,
+)
+from opticapa.shared.common.service.crud.crud_verify_existence import (
+    async_verify_existence_and_get,
+)
+
+
+class OrmCrudAsyncService:
+    """
+    Async counterpart of OrmCrudSyncService, to be used by endpoints depending on an AsyncSession so that the event
+    loop isn't blocked while waiting for the database. Statements are built by the same builders as OrmCrudSyncService.
+    """
+
+    @classmethod
+    async def create_procedure(
+        cls,
+        db_object: Union[
+            Fenetre,
+            PeriodeExclusion,
+            Alternat,
+            AxeEf,
+            GroupementVoies,
+            RegleAlternat,
+            ServiceAnnuel,
+        ],
+        session: AsyncSession,
+    ):
+        """
+        This function executes an ORM add procedure for a create operation of a CRUD service.
+        During this procedure, we first flush before committing in order to launch ORM events and access to trigger
+        logs.
+        Args:
+            db_object: object to insert in db which must be loaded beforehand.
+            session: database session
+        """
+        session.add(db_object)
+        await cls._commit_and_log_session(
+            session=session, db_object=db_object, crud_operation=CrudOperation.create
+        )
+
+    @classmethod
+    async def update_procedure(
+        cls,
+        db_object: Union[
+            Fenetre, PeriodeExclusion, Alternat, AxeEf, GroupementVoies, RegleAlternat
+        ],
+        obj_to_update: Union[
+            Fenetre, PeriodeExclusion, Alternat, AxeEf, GroupementVoies, RegleAlternat
+        ],
+        session: AsyncSession,
+    ):
+        """
+        This function executes an update operation of a CRUD service with explicit statements, see
+        OrmCrudSyncService.update_procedure.
+        Args:
+            db_object: object holding the new values, and the new children
+            session: database session
+            obj_to_update: capacity object to update. Mandatory if ORM operation is an update
+        """
+        for stmt, params in build_update_statements(
+            obj_to_update=obj_to_update, db_object=db_object
+        ):
+            await session.execute(stmt, params)
+        await cls._commit_and_log_session(
+            session=session, db_object=db_object, crud_operation=CrudOperation.update
+        )
+
+    @classmethod
+    async def delete_procedure(
+        cls,
+        db_object: Union[
+            Fenetre,
+            PeriodeExclusion,
+            Alternat,
+            AxeEf,
+            GroupementVoies,
+            RegleAlternat,
+        ],
+        session: AsyncSession,
+    ):
+        """
+        This function executes an ORM procedure delete for a delete operation of CRUD service.
+        During this procedure, we first flush before committing in order to launch ORM events and access to trigger
+        logs.
+        Args:
+            db_object: object to delete in db which must be loaded beforehand.
+            session: database session
+        """
+        await session.delete(db_object)
+        await cls._commit_and_log_session(
+            session=session, db_object=db_object, crud_operation=CrudOperation.delete
+        )
+
+    @classmethod
+    async def upsert_procedure(
+        cls,
+        session: AsyncSession,
+        main_model: Type[Base],
+        object_to_insert: Union[dict[str, Any], list[dict[str, Any]]],
+        sub_object_models: dict[str, Type[Base]],
+        sub_obj_parent_columns: Optional[dict[str, Column]] = None,
+        id_column: str = "id",
+        do_update: bool = False,
+        execute_after_insert: Optional[Callable] = None,
+        execute_after_delete: Optional[Callable] = None,
+    ):
+        """
+        Inserts in database object_to_insert and their sub objects.
+        If do_update is True, this method delete all previous sub objects, and update object_to_insert.
+
+        Args:
+            session: db session
+            main_model: table in which to insert object_to_insert (main object to insert)
+            object_to_insert: dict mapping column names with values to insert in db
+            sub_object_models: dict mapping the key of the sub_objects in object_to_insert with the table in which to
+            insert the sub_objects
+            sub_obj_parent_columns: dict mapping the key of the sub_objects in object_to_insert with the column to
+             retrieve the id of object_to_insert in table sub_model
+            id_column: name of the primary key column in table main_model
+            do_update: if True, on_conflict_do_update is added to insert statement.
+            execute_after_insert: async function to execute after inserting sub-objects
+            execute_after_delete: async function to execute after deleting sub-objects (when do_update is True)
+        """
+        if do_update:
+            crud_operation = CrudOperation.update
+            updated_ids = [object_to_insert.get(id_column, "")]
+            # Without an id, the object is created by the upsert : it has no sub objects to delete yet
+            if object_to_insert.get(id_column):
+                for key, sub_model in sub_object_models.items():
+                    await cls.delete_object(
+                        object_ids=updated_ids,
+                        model_to_delete=sub_model,
+                        model_to_retrieve=main_model,
+                        db=session,
+                        model_column_id=sub_obj_parent_columns.get(key, None)
+                        if sub_obj_parent_columns
+                        else None,
+                        # The main object is upserted right after : checking its existence beforehand is useless
+                        verify_existence=False,
+                    )
+                if execute_after_delete is not None:
+                    await execute_after_delete(
+                        session=session,
+                        updated_pe_ids=tuple(updated_ids),
+                    )
+        else:
+            crud_operation = CrudOperation.create
+
+        ids = await cls.multiple_insert_procedure(
+            session=session,
+            main_model=main_model,
+            object_to_insert=object_to_insert,
+            sub_object_models=sub_object_models,
+            id_column=id_column,
+            do_update=do_update,
+        )
+
+        if execute_after_insert:
+            await execute_after_insert(session=session)
+
+        await session.commit()
+        # Lazily formatted : the ids of a batch insert are only stringified when debug logs are enabled
+        logger.debug(
+            "%s %s with id(s) %s", crud_operation.value, main_model.__tablename__, ids
+        )
+
+    @classmethod
+    async def multiple_insert_procedure(
+        cls,
+        session: AsyncSession,
+        main_model: Type[Base],
+        object_to_insert: Union[dict[str, Any], list[dict[str, Any]]],
+        sub_object_models: dict[str, Type[Base]],
+        id_column: str = "id",
+        do_update: bool = False,
+    ) -> Union[Any, list[Any]]:
+        """
+        Inserts object_to_insert and their sub objects.
+        Objects are inserted with one executemany insert statement per set of columns, and sub objects with one insert
+        statement per sub object model.
+        If do_update is True and several objects have the same id, the last one is upserted.
+
+        Args:
+            session: db session
+            main_model: table in which to insert object_to_insert (main object to insert)
+            object_to_insert: dict mapping column names with values to insert in db, or list of such dicts
+            sub_object_models: dict mapping the key of the sub_objects in object_to_insert with the table in which to
+            insert the sub_objects
+            id_column: name of the primary key column in table main_model
+            do_update: if True, on_conflict_do_update is added to insert statement.
+
+        Returns:
+            inserted id if object_to_insert is a dict, list of inserted ids otherwise
+
+        """
+        # A single object goes through the same statements as a list, its id being returned by the insert as well
+        single_object = not isinstance(object_to_insert, list)
+        objects = [object_to_insert] if single_object else object_to_insert
+        if not objects:
+            return []
+
+        sub_objects: dict[str, list[dict[str, Any]]] = {
+            key: [] for key in sub_object_models
+        }
+        for obj in objects:
+            for key in sub_object_models:
+                sub_objects[key].extend(obj.pop(key, None) or [])
+        # One executemany statement per set of columns, which SQLAlchemy sends as pages of multi-row inserts
+        ids_by_index = {}
+        for columns, indexes in group_insert_rows(
+            rows=objects, id_column=id_column, do_update=do_update
+        ).items():
+            upsert_stmt = build_insert_stmt(
+                main_model=main_model,
+                columns=columns,
+                id_column=id_column,
+                do_update=do_update,
+            )
+            params = [objects[index] for index in indexes]
+            if id_column in columns and all(
+                obj[id_column] is not None for obj in params
+            ):
+                # The ids are known : an ordered RETURNING would make SQLAlchemy send these rows one by one
+                await cls.execute_stmt(
+                    stmt=upsert_stmt,
+                    session=session,
+                    main_model=main_model,
+                    params=params,
+                )
+                continue
+            result = await cls.execute_stmt(
+                stmt=upsert_stmt.returning(
+                    main_model.__table__.c[id_column], sort_by_parameter_order=True
+                ),
+                session=session,
+                main_model=main_model,
+                params=params,
+            )
+            ids_by_index.update(zip(indexes, result.scalars().all()))
+        # Rows inserted with their id, or dropped as duplicates, have the id given in their params
+        ids = [
+            ids_by_index[index] if index in ids_by_index else obj[id_column]
+            for index, obj in enumerate(objects)
+        ]
+        for key, model in sub_object_models.items():
+            await cls._insert_sub_objects(
+                session=session, model=model, objs=sub_objects[key]
+            )
+        return ids[0] if single_object else ids
+
+    @staticmethod
+    async def _insert_sub_objects(
+        session: AsyncSession,
+        model: Type[Base],
+        objs: list[dict[str, Any]],
+    ):
+        """
+        Inserts sub objects with one executemany insert statement per set of columns.
+
+        Args:
+            session: DB session
+            model: table in which to insert the sub objects
+            objs: list of dicts mapping column names with values to insert in db
+        """
+        if not objs:
+            logger.debug(
+                f"Sub-object {model.__tablename__} is empty, skipping insert."
+            )
+        # A Core insert of the table : the ORM bulk insert of the model would leave out the keys set to None, the
+        # server default being inserted instead of NULL
+        for indexes in group_insert_rows(rows=objs).values():
+            await session.execute(
+                insert(model.__table__), [objs[index] for index in indexes]
+            )
+
+    @staticmethod
+    async def execute_stmt(
+        session: AsyncSession,
+        stmt: Insert,
+        main_model: Type[Base],
+        params: Optional[Union[dict[str, Any], list[dict[str, Any]]]] = None,
+    ) -> sqla.Result:
+        """
+        This method execute an insert statement and catch integrity error.
+
+        Args:
+            session: DB session,
+            stmt: insert statement to execute
+            main_model: table in which to insert object_to_insert (main object to insert)
+            params: values to insert, a list of them being inserted with executemany
+
+        Returns:
+            the result of the statement
+
+        """
+        try:
+            return await session.execute(stmt, params)
+        except IntegrityError as e:
+            logger.error(str(e))
+            raise translate_integrity_error(e, main_model.__tablename__) from e
+
+    @classmethod
+    async def delete_object(
+        cls,
+        object_ids: list[Union[int, str, uuid.UUID]],
+        model_to_delete: Base,
+        model_to_retrieve: Base,
+        db: AsyncSession,
+        model_column_id: Optional[Column] = None,
+        verify_existence: bool = True,
+    ):
+        """
+        Deletes objects from the database by their IDs after verifying their existence.
+
+        This method determines the appropriate ID column based on the model,
+        verifies that the objects exist, and performs a bulk delete operation
+        using the provided session. When the objects are deleted from model_to_retrieve by their id, their
+        existence is verified with the ids returned by the DELETE itself.
+
+        Args:
+            object_ids: List of object IDs to delete.
+            model_to_delete: The SQLAlchemy model class of the objects to delete.
+            model_to_retrieve: The model used to verify object existence (often the same as model_to_delete).
+            model_column_id: the column of the pkey or fkey where to find the object ids
+            db: The database session (AsyncSession) used to execute the deletion.
+            verify_existence: if False, the existence of the objects in model_to_retrieve isn't verified.
+        """
+        if not object_ids:
+            return
+        if not model_column_id:
+            model_column_id = model_to_delete.id
+        stmt = (
+            sqla.delete(model_to_delete)
+            .where(model_column_id.in_(object_ids))
+            .execution_options(synchronize_session=False)
+        )
+        if (
+            verify_existence
+            and model_to_retrieve is model_to_delete
+            and model_column_id is model_to_delete.id
+        ):
+            # The ids returned by the DELETE tell which ones don't exist, without any SELECT beforehand.
+            # Raising rolls the whole transaction back, the deletion included.
+            deleted = await db.execute(stmt.returning(model_column_id))
+            deleted_ids = {str(deleted_id) for deleted_id in deleted.scalars()}
+            missing_ids = [
+                object_id for object_id in object_ids if str(object_id) not in deleted_ids
+            ]
+            if missing_ids:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"{model_to_delete.__tablename__} with ids {missing_ids} do not exist",
+                )
+            return
+        if verify_existence:
+            await async_verify_existence_and_get(
+                object_ids, model=model_to_retrieve, db=db, return_model=False
+            )
+        await db.execute(stmt)
+
+    @staticmethod
+    async def _commit_and_log_session(
+        session: AsyncSession,
+        db_object: Union[
+            Fenetre,
+            PeriodeExclusion,
+            Alternat,
+            GroupementVoies,
+            RegleAlternat,
+            ServiceAnnuel,
+        ],
+        crud_operation: CrudOperation,
+    ):
+        """
+        This method commits an ORM session after a CRUD operation is performed. If done well, the ressource to commit is
+        refreshed and a log is sent when the operation performed correctly.
+        Args:
+            session: DB session
+            db_object: Capacity object to be committed
+            crud_operation: CRUD operation performed. Either create, update, or delete
+        """
+        try:
+            await session.flush()
+            # Read before the commit expires db_object : it couldn't be lazily refreshed with an AsyncSession
+            db_object_id = db_object.id
+            await session.commit()
+        except IntegrityError as e:
+            logger.error(str(e))
+            raise translate_integrity_error(e, db_object.__tablename__) from e
+        logger.debug(
+            f"{crud_operation.value} {db_object.__tablename__} with id {db_object_id}"
+        )
@@ -0,0 +1,71 @@
+import re
+from typing import Callable, Optional
+
+from fastapi import HTTPException
+from psycopg2 import errorcodes
+from sqlalchemy.exc import IntegrityError
+from starlette import status
+
+
+# Detail of a unique violation, e.g. Key (libelle)=(Axe 1) already exists.
+_UNIQUE_VIOLATION_DETAIL = re.compile(
+    r"Key \((?P<columns>.*)\)=\((?P<values>.*)\) already exists"
+)
+
+
+def _error_detail(e: IntegrityError) -> Optional[str]:
+    """
+    Returns the detail of the error raised by the database : psycopg2 gives it in its diagnostics, while the asyncpg
+    error is the cause of the error raised by SQLAlchemy's asyncpg adapter
+    """
+    diag = getattr(e.orig, "diag", None)
+    if diag is not None:
+        return diag.message_detail
+    return getattr(e.orig.__cause__, "detail", None)
+
+
+def _unique_violation(e: IntegrityError, tablename: str) -> HTTPException:
+    # The parameters don't tell which row failed in an executemany : the duplicated key is read from the error detail
+    match = _UNIQUE_VIOLATION_DETAIL.search(_error_detail(e) or "")
+    key = f" with {match['columns']} {match['values']}" if match else ""
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=(
+            f"Object {tablename}{key} already exists. "
+            "Please try again with another label."
+        ),
+    )
+
+
+def _not_null_violation(e: IntegrityError, tablename: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+def _integrity_error(e: IntegrityError, tablename: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        detail=f"Database integrity error: {str(e)}",
+    )
+
+
+# Keyed by SQLSTATE, which psycopg2 errors and SQLAlchemy's wrapping of asyncpg errors both expose as pgcode
+_INTEGRITY_ERRORS: dict[str, Callable[[IntegrityError, str], HTTPException]] = {
+    errorcodes.UNIQUE_VIOLATION: _unique_violation,
+    errorcodes.NOT_NULL_VIOLATION: _not_null_violation,
+}
+
+
+def translate_integrity_error(e: IntegrityError, tablename: str) -> HTTPException:
+    """
+    Translates an integrity error raised by the database into the HTTP error to return
+    Args:
+        e: integrity error raised by SQLAlchemy
+        tablename: name of the table of the object being written
+
+    Returns: the HTTPException to raise
+
+    """
+    translate = _INTEGRITY_ERRORS.get(
+        getattr(e.orig, "pgcode", None), _integrity_error
+    )
+    return translate(e, tablename)
@@ -0,0 +1,205 @@
+from typing import Union, Optional, Type, Any, Iterable
+
+import sqlalchemy as sqla
+from opticapa_models import (
+    Alternat,
+    Fenetre,
+    GroupementVoies,
+    RegleAlternat,
+    PeriodeExclusion,
+)
+from opticapa_models.infrastructure.models.axe_ef import AxeEf
+from sqlalchemy.dialects.postgresql import insert, Insert
+
+from opticapa.shared.database.base import Base
+
+# Collections of children replaced as a whole when these models are updated
+_REPLACED_COLLECTIONS: dict[Type[Base], str] = {
+    Fenetre: "ressources_espace_temps",
+    PeriodeExclusion: "ressources_espace_temps",
+    Alternat: "lvpks",
+    GroupementVoies: "lvpks",
+    AxeEf: "sections",
+}
+
+
+def build_update_statements(
+    obj_to_update: Union[
+        Fenetre, PeriodeExclusion, Alternat, AxeEf, GroupementVoies, RegleAlternat
+    ],
+    db_object: Union[
+        Fenetre, PeriodeExclusion, Alternat, AxeEf, GroupementVoies, RegleAlternat
+    ],
+) -> list[tuple[sqla.Executable, Optional[list[dict[str, Any]]]]]:
+    """
+    Builds the statements updating obj_to_update with db_object : the deletion of the children of obj_to_update,
+    the update of the columns set on db_object, and the insertion of the children of db_object.
+    Args:
+        obj_to_update: capacity object to update, loaded from db
+        db_object: object holding the new values, and the new children
+
+    Returns:
+        the statements to execute in order, with their executemany parameters if any
+    """
+    collection = next(
+        (
+            collection
+            for replaced_model, collection in _REPLACED_COLLECTIONS.items()
+            if isinstance(obj_to_update, replaced_model)
+        ),
+        None,
+    )
+
+    model = type(obj_to_update)
+    mapper = sqla.inspect(model)
+    new_values = sqla.inspect(db_object).dict
+    statements = []
+
+    children_rows = []
+    if collection:
+        relationship = mapper.relationships[collection]
+        # Pairs of (column of model, column of the table referencing model)
+        parent_pairs = relationship.synchronize_pairs
+        parent_values = {
+            column.key: getattr(
+                obj_to_update, mapper.get_property_by_column(parent_column).key
+            )
+            for parent_column, column in parent_pairs
+        }
+        children = new_values.get(collection, [])
+        if relationship.secondary is not None:
+            # Many-to-many : only the rows of the association table are replaced
+            children_table = relationship.secondary
+            children_rows = [
+                {
+                    **parent_values,
+                    **{
+                        column.key: getattr(
+                            child,
+                            relationship.mapper.get_property_by_column(
+                                child_column
+                            ).key,
+                        )
+                        for child_column, column in relationship.secondary_synchronize_pairs
+                    },
+                }
+                for child in children
+            ]
+        else:
+            children_table = relationship.mapper.local_table
+            children_rows = [
+                {
+                    **{
+                        column_property.columns[0].key: child_values[column_property.key]
+                        for column_property in relationship.mapper.column_attrs
+                        if column_property.key in child_values
+                    },
+                    **parent_values,
+                }
+                for child_values in (sqla.inspect(child).dict for child in children)
+            ]
+        statements.append(
+            (
+                sqla.delete(children_table).where(
+                    *[
+                        column == parent_values[column.key]
+                        for _, column in parent_pairs
+                    ]
+                ),
+                None,
+            )
+        )
+
+    primary_keys = {column.key for column in mapper.primary_key}
+    # Core statements on the tables : their values are keyed by column, not by attribute of the model
+    update_values = {
+        column_property.columns[0].key: new_values[column_property.key]
+        for column_property in mapper.column_attrs
+        if column_property.key in new_values
+        and column_property.columns[0].key not in primary_keys
+    }
+    if update_values:
+        table = mapper.local_table
+        statements.append(
+            (
+                sqla.update(table)
+                .where(table.c.id == obj_to_update.id)
+                .values(update_values),
+                None,
+            )
+        )
+
+    # Children may not all have the same attributes set : an executemany insert takes its columns from its first
+    # row, so children are inserted by set of columns
+    for indexes in group_insert_rows(rows=children_rows).values():
+        statements.append(
+            (insert(children_table), [children_rows[index] for index in indexes])
+        )
+    return statements
+
+
+def build_insert_stmt(
+    main_model: Type[Base],
+    columns: Iterable[str],
+    id_column: str = "id",
+    do_update: bool = False,
+) -> Insert:
+    """
+    Builds the insert statement of objects of main_model, their values being given as parameters when executing it.
+
+    Args:
+        main_model: table in which to insert values
+        columns: names of the columns the inserted values are given for
+        id_column: name of the primary key column in table main_model
+        do_update: if True, on_conflict_do_update is added to insert statement.
+
+    Returns:
+        the insert statement
+    """
+    # A Core insert of the table, the ORM bulk insert of the model leaving out the keys set to None
+    upsert_stmt = insert(main_model.__table__)
+    if do_update:
+        update_columns = {
+            key: upsert_stmt.excluded[key]
+            for key in columns
+            if key
+            not in (
+                id_column,
+                "created_at",
+                "created_by",
+            )
+        }
+        upsert_stmt = upsert_stmt.on_conflict_do_update(
+            index_elements=[id_column], set_=update_columns
+        )
+    return upsert_stmt
+
+
+def group_insert_rows(
+    rows: list[dict[str, Any]],
+    id_column: str = "id",
+    do_update: bool = False,
+) -> dict[frozenset[str], list[int]]:
+    """
+    Groups the rows to insert by set of columns, each group being inserted by one executemany insert statement.
+    If do_update is True, only the last row of each id is kept : PostgreSQL can't upsert the same row twice within one
+    statement, and the last row won when rows were upserted one by one.
+
+    Args:
+        rows: dicts mapping column names with values to insert in db
+        id_column: name of the primary key column
+        do_update: if True, rows are upserted
+
+    Returns:
+        the indexes in rows of the rows to insert, by set of columns
+    """
+    last_index_by_id = (
+        {row[id_column]: index for index, row in enumerate(rows) if row.get(id_column)}
+        if do_update
+        else {}
+    )
+    groups: dict[frozenset[str], list[int]] = {}
+    for index, row in enumerate(rows):
+        if last_index_by_id.get(row.get(id_column), index) == index:
+            groups.setdefault(frozenset(row), []).append(index)
+    return groups
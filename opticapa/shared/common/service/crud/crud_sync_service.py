@@ -1,5 +1,11 @@
+import csv
+import io
 import uuid
-from typing import Union, Optional, Type, Any, Callable
+from contextlib import contextmanager
+from datetime import date, datetime, time
+from decimal import Decimal
+from enum import Enum
+from typing import Union, Optional, Type, Any, Callable, Iterator
 
 import sqlalchemy as sqla
 from fastapi import HTTPException
@@ -14,7 +20,7 @@ from opticapa_models import (
 from opticapa_models.infrastructure.models.axe_ef import AxeEf
 from sqlalchemy import Column
 from sqlalchemy.dialects.postgresql import insert, Insert
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy.exc import DBAPIError, IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from starlette import status
@@ -22,12 +28,110 @@ from starlette import status
 from opticapa.shared.common.enums import CrudOperation
 from opticapa.shared.database.base import Base
 from opticapa.shared.utils.logger import logger
-from psycopg2 import errors
+from opticapa.shared.common.service.crud.crud_errors import translate_integrity_error
+from opticapa.shared.common.service.crud.crud_statements import (
+    build_insert_stmt,
+    build_update_statements,
+    group_insert_rows,
+)
 from opticapa.shared.common.service.crud.crud_verify_existence import (
     verify_existence_and_get,
 )
 
 
+@contextmanager
+def _pipeline(session: Session) -> Iterator[None]:
+    """
+    Sends the statements executed within this context back-to-back, with the pipeline mode of psycopg 3, results
+    being collected at the end of the context.
+    With drivers which have no pipeline mode, like psycopg2, statements are executed as usual.
+    Args:
+        session: database session
+    """
+    dbapi_connection = session.connection().connection.dbapi_connection
+    pipeline = getattr(dbapi_connection, "pipeline", None)
+    if pipeline is None:
+        yield
+        return
+    with pipeline():
+        yield
+
+
+# From this number of sub objects, COPY is faster than a multi-row INSERT despite its setup
+_COPY_MIN_ROWS = 500
+_COPY_SCALAR_TYPES = (str, int, float, Decimal, uuid.UUID, datetime, date, time)
+
+
+def _copy_sub_objects(
+    session: Session, model: Type[Base], objs: list[dict[str, Any]]
+) -> bool:
+    """
+    Inserts sub objects with COPY FROM STDIN, in the transaction of the session.
+    COPY is only used with psycopg2, for sub objects sharing the same keys, holding scalar values only, and not relying
+    on python side column defaults nor on column types processing bound values, which COPY wouldn't apply.
+    Args:
+        session: DB session
+        model: table in which to insert the sub objects
+        objs: list of dicts mapping column names with values to insert in db
+
+    Returns: True if the sub objects were copied, False if they have to be inserted another way
+
+    """
+    bind = session.get_bind()
+    if bind.dialect.driver != "psycopg2":
+        return False
+    mapper = sqla.inspect(model)
+    keys = list(objs[0])
+    if any(key not in mapper.columns for key in keys):
+        return False
+    columns = [mapper.columns[key] for key in keys]
+    # COPY bypasses the type processing of SQLAlchemy, which the insert would apply to the values of these columns
+    if any(
+        column.type.bind_processor(bind.dialect) is not None
+        or column.type.bind_expression(sqla.bindparam(column.key, type_=column.type))
+        is not None
+        for column in columns
+    ):
+        return False
+    column_names = {column.name for column in columns}
+    if any(
+        column.default is not None and column.name not in column_names
+        for column in model.__table__.columns
+    ):
+        return False
+    if any(
+        obj.keys() != objs[0].keys()
+        or any(
+            value is not None
+            and (not isinstance(value, _COPY_SCALAR_TYPES) or isinstance(value, Enum))
+            for value in obj.values()
+        )
+        for obj in objs
+    ):
+        return False
+
+    # In CSV format, an unquoted empty field is NULL while a quoted one is an empty string
+    csv_buffer = io.StringIO()
+    writer = csv.writer(csv_buffer, quoting=csv.QUOTE_NOTNULL, lineterminator="\n")
+    writer.writerows([obj[key] for key in keys] for obj in objs)
+    csv_buffer.seek(0)
+    preparer = bind.dialect.identifier_preparer
+    copy_stmt = (
+        f"COPY {preparer.format_table(model.__table__)} "
+        f"({', '.join(preparer.quote(column.name) for column in columns)}) "
+        "FROM STDIN WITH (FORMAT csv)"
+    )
+    with session.connection().connection.cursor() as cursor:
+        try:
+            cursor.copy_expert(copy_stmt, csv_buffer)
+        except bind.dialect.loaded_dbapi.Error as e:
+            # Wrapped like SQLAlchemy wraps the errors of the statements it executes, e.g. into an IntegrityError
+            raise DBAPIError.instance(
+                copy_stmt, None, e, bind.dialect.loaded_dbapi.Error, dialect=bind.dialect
+            ) from e
+    return True
+
+
 class OrmCrudSyncService:
     @classmethod
     def create_procedure(
@@ -67,21 +171,19 @@ class OrmCrudSyncService:
         session: Session,
     ):
         """
-        This function executes an ORM procedure merge for an update operation of a CRUD service.
-        During this procedure, we first flush before committing in order to launch ORM events and access to trigger logs.
+        This function executes an update operation of a CRUD service with explicit statements, instead of an ORM
+        merge which would select the object and its collections beforehand:
+        the children of obj_to_update are deleted, obj_to_update is updated with the values set on db_object, then the
+        children of db_object are inserted.
         Args:
-            db_object: object to merge in db which must be loaded beforehand.
+            db_object: object holding the new values, and the new children
             session: database session
             obj_to_update: capacity object to update. Mandatory if ORM operation is an update
         """
-        if isinstance(obj_to_update, (Fenetre, PeriodeExclusion)):
-            obj_to_update.ressources_espace_temps.clear()
-        elif isinstance(obj_to_update, (Alternat, GroupementVoies)):
-            obj_to_update.lvpks.clear()
-        elif isinstance(obj_to_update, AxeEf):
-            obj_to_update.sections.clear()
-        session.flush()
-        db_object = session.merge(db_object)
+        for stmt, params in build_update_statements(
+            obj_to_update=obj_to_update, db_object=db_object
+        ):
+            session.execute(stmt, params)
         cls._commit_and_log_session(
             session=session, db_object=db_object, crud_operation=CrudOperation.update
         )
@@ -141,42 +243,48 @@ class OrmCrudSyncService:
             execute_after_insert: async function to execute after inserting sub-objects
             execute_after_delete: async function to execute after deleting sub-objects (when do_update is True)
         """
-        if do_update:
-            crud_operation = CrudOperation.update
-            updated_ids = [object_to_insert.get(id_column, "")]
-            for key, sub_model in sub_object_models.items():
-                cls.delete_object(
-                    object_ids=updated_ids,
-                    model_to_delete=sub_model,
-                    model_to_retrieve=main_model,
-                    db=session,
-                    model_column_id=sub_obj_parent_columns.get(key, None)
-                    if sub_obj_parent_columns
-                    else None,
-                )
-                if execute_after_insert:
-                    execute_after_delete(
-                        session=session,
-                        updated_pe_ids=tuple(updated_ids),
-                    )
-        else:
-            crud_operation = CrudOperation.create
-
-        ids = cls.multiple_insert_procedure(
-            session=session,
-            main_model=main_model,
-            object_to_insert=object_to_insert,
-            sub_object_models=sub_object_models,
-            id_column=id_column,
-            do_update=do_update,
-        )
+        with _pipeline(session):
+            if do_update:
+                crud_operation = CrudOperation.update
+                updated_ids = [object_to_insert.get(id_column, "")]
+                # Without an id, the object is created by the upsert : it has no sub objects to delete yet
+                if object_to_insert.get(id_column):
+                    for key, sub_model in sub_object_models.items():
+                        cls.delete_object(
+                            object_ids=updated_ids,
+                            model_to_delete=sub_model,
+                            model_to_retrieve=main_model,
+                            db=session,
+                            model_column_id=sub_obj_parent_columns.get(key, None)
+                            if sub_obj_parent_columns
+                            else None,
+                            # The main object is upserted right after : checking its existence beforehand is useless
+                            verify_existence=False,
+                        )
+                    if execute_after_delete is not None:
+                        execute_after_delete(
+                            session=session,
+                            updated_pe_ids=tuple(updated_ids),
+                        )
+            else:
+                crud_operation = CrudOperation.create
+
+            ids = cls.multiple_insert_procedure(
+                session=session,
+                main_model=main_model,
+                object_to_insert=object_to_insert,
+                sub_object_models=sub_object_models,
+                id_column=id_column,
+                do_update=do_update,
+            )
 
-        if execute_after_insert:
-            execute_after_insert(session=session)
+            if execute_after_insert:
+                execute_after_insert(session=session)
 
         session.commit()
+        # Lazily formatted : the ids of a batch insert are only stringified when debug logs are enabled
         logger.debug(
-            f"{crud_operation.value} {main_model.__tablename__} with id(s) {ids}"
+            "%s %s with id(s) %s", crud_operation.value, main_model.__tablename__, ids
         )
 
     @classmethod
@@ -184,49 +292,82 @@ class OrmCrudSyncService:
         cls,
         session: Session,
         main_model: Type[Base],
-        object_to_insert: dict[str, Any],
+        object_to_insert: Union[dict[str, Any], list[dict[str, Any]]],
         sub_object_models: dict[str, Type[Base]],
         id_column: str = "id",
         do_update: bool = False,
-    ) -> str:
+    ) -> Union[Any, list[Any]]:
         """
+        Inserts object_to_insert and their sub objects.
+        Objects are inserted with one executemany insert statement per set of columns, and sub objects with one insert
+        statement per sub object model.
+        If do_update is True and several objects have the same id, the last one is upserted.
 
         Args:
             session: db session
             main_model: table in which to insert object_to_insert (main object to insert)
-            object_to_insert: dict mapping column names with values to insert in db
+            object_to_insert: dict mapping column names with values to insert in db, or list of such dicts
             sub_object_models: dict mapping the key of the sub_objects in object_to_insert with the table in which to
             insert the sub_objects
             id_column: name of the primary key column in table main_model
             do_update: if True, on_conflict_do_update is added to insert statement.
 
         Returns:
-            inserted ids
+            inserted id if object_to_insert is a dict, list of inserted ids otherwise
 
         """
-        if isinstance(object_to_insert, list):
-            ids = ""
-            for obj in object_to_insert:
-                cls.insert_procedure(
+        # A single object goes through the same statements as a list, its id being returned by the insert as well
+        single_object = not isinstance(object_to_insert, list)
+        objects = [object_to_insert] if single_object else object_to_insert
+        if not objects:
+            return []
+
+        sub_objects: dict[str, list[dict[str, Any]]] = {
+            key: [] for key in sub_object_models
+        }
+        for obj in objects:
+            for key in sub_object_models:
+                sub_objects[key].extend(obj.pop(key, None) or [])
+        # One executemany statement per set of columns, which SQLAlchemy sends as pages of multi-row inserts
+        ids_by_index = {}
+        for columns, indexes in group_insert_rows(
+            rows=objects, id_column=id_column, do_update=do_update
+        ).items():
+            upsert_stmt = build_insert_stmt(
+                main_model=main_model,
+                columns=columns,
+                id_column=id_column,
+                do_update=do_update,
+            )
+            params = [objects[index] for index in indexes]
+            if id_column in columns and all(
+                obj[id_column] is not None for obj in params
+            ):
+                # The ids are known : an ordered RETURNING would make SQLAlchemy send these rows one by one
+                cls.execute_stmt(
+                    stmt=upsert_stmt,
                     session=session,
                     main_model=main_model,
-                    object_to_insert=obj,
-                    sub_object_models=sub_object_models,
-                    id_column=id_column,
-                    do_update=do_update,
+                    params=params,
                 )
-                ids = f"{ids} {obj.get(id_column, '')} ,"
-        else:
-            ids = object_to_insert.get(id_column, "")
-            cls.insert_procedure(
+                continue
+            result = cls.execute_stmt(
+                stmt=upsert_stmt.returning(
+                    main_model.__table__.c[id_column], sort_by_parameter_order=True
+                ),
                 session=session,
                 main_model=main_model,
-                object_to_insert=object_to_insert,
-                sub_object_models=sub_object_models,
-                id_column=id_column,
-                do_update=do_update,
+                params=params,
             )
-        return ids
+            ids_by_index.update(zip(indexes, result.scalars().all()))
+        # Rows inserted with their id, or dropped as duplicates, have the id given in their params
+        ids = [
+            ids_by_index[index] if index in ids_by_index else obj[id_column]
+            for index, obj in enumerate(objects)
+        ]
+        for key, model in sub_object_models.items():
+            cls._insert_sub_objects(session=session, model=model, objs=sub_objects[key])
+        return ids[0] if single_object else ids
 
     @classmethod
     def insert_procedure(
@@ -259,33 +400,49 @@ class OrmCrudSyncService:
             for key, model in sub_object_models.items()
             if (objs := object_to_insert.pop(key, None)) is not None
         ]
-        upsert_stmt = insert(main_model).values(object_to_insert)
-        if do_update:
-            update_columns = {
-                key: upsert_stmt.excluded[key]
-                for key in object_to_insert
-                if key
-                not in (
-                    id_column,
-                    "created_at",
-                    "created_by",
-                )
-            }
-            upsert_stmt = upsert_stmt.on_conflict_do_update(
-                index_elements=[id_column], set_=update_columns
-            )
+        upsert_stmt = build_insert_stmt(
+            main_model=main_model,
+            columns=object_to_insert,
+            id_column=id_column,
+            do_update=do_update,
+        )
 
         cls.execute_stmt(
             stmt=upsert_stmt,
             session=session,
             main_model=main_model,
+            params=object_to_insert,
         )
         for model, objs in sub_objects:
-            if objs:
-                session.execute(insert(model).values(objs))
-            else:
-                logger.debug(
-                    f"Sub-object {model.__tablename__} is empty, skipping insert."
+            cls._insert_sub_objects(session=session, model=model, objs=objs)
+
+    @staticmethod
+    def _insert_sub_objects(
+        session: Session,
+        model: Type[Base],
+        objs: list[dict[str, Any]],
+    ):
+        """
+        Inserts sub objects with one executemany insert statement per set of columns, or with COPY when there are many
+        of them.
+
+        Args:
+            session: DB session
+            model: table in which to insert the sub objects
+            objs: list of dicts mapping column names with values to insert in db
+        """
+        if not objs:
+            logger.debug(
+                f"Sub-object {model.__tablename__} is empty, skipping insert."
+            )
+        elif len(objs) < _COPY_MIN_ROWS or not _copy_sub_objects(
+            session=session, model=model, objs=objs
+        ):
+            # A Core insert of the table : the ORM bulk insert of the model would leave out the keys set to None, the
+            # server default being inserted instead of NULL
+            for indexes in group_insert_rows(rows=objs).values():
+                session.execute(
+                    insert(model.__table__), [objs[index] for index in indexes]
                 )
 
     @staticmethod
@@ -293,7 +450,8 @@ class OrmCrudSyncService:
         session: Session,
         stmt: Insert,
         main_model: Type[Base],
-    ):
+        params: Optional[Union[dict[str, Any], list[dict[str, Any]]]] = None,
+    ) -> sqla.Result:
         """
         This method execute an insert statement and catch integrity error.
 
@@ -301,32 +459,17 @@ class OrmCrudSyncService:
             session: DB session,
             stmt: insert statement to execute
             main_model: table in which to insert object_to_insert (main object to insert)
+            params: values to insert, a list of them being inserted with executemany
+
+        Returns:
+            the result of the statement
 
         """
         try:
-            session.execute(stmt)
+            return session.execute(stmt, params)
         except IntegrityError as e:
-            orig = e.orig
             logger.error(str(e))
-            if isinstance(orig, errors.UniqueViolation):
-                raise HTTPException(
-                    status_code=status.HTTP_409_CONFLICT,
-                    detail=(
-                        f"Object {main_model.__tablename__} with label "
-                        f"{e.params.get('libelle', '')} already exists."
-                        "Please try again with another label."
-                    ),
-                )
-            elif isinstance(orig, errors.NotNullViolation):
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=str(e),
-                )
-            else:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail=f"Database integrity error: {str(e)}",
-                ) from e
+            raise translate_integrity_error(e, main_model.__tablename__) from e
 
     @classmethod
     def delete_object(
@@ -336,13 +479,15 @@ class OrmCrudSyncService:
         model_to_retrieve: Base,
         db: AsyncSession,
         model_column_id: Optional[Column] = None,
+        verify_existence: bool = True,
     ):
         """
         Deletes objects from the database by their IDs after verifying their existence.
 
         This method determines the appropriate ID column based on the model,
         verifies that the objects exist, and performs a bulk delete operation
-        using the provided session.
+        using the provided session. When the objects are deleted from model_to_retrieve by their id, their
+        existence is verified with the ids returned by the DELETE itself.
 
         Args:
             object_ids: List of object IDs to delete.
@@ -350,15 +495,39 @@ class OrmCrudSyncService:
             model_to_retrieve: The model used to verify object existence (often the same as model_to_delete).
             model_column_id: the column of the pkey or fkey where to find the object ids
             db: The database session (AsyncSession) used to execute the deletion.
+            verify_existence: if False, the existence of the objects in model_to_retrieve isn't verified.
         """
-        verify_existence_and_get(object_ids, model=model_to_retrieve, db=db)
+        if not object_ids:
+            return
         if not model_column_id:
             model_column_id = model_to_delete.id
         stmt = (
             sqla.delete(model_to_delete)
             .where(model_column_id.in_(object_ids))
-            .execution_options(synchronize_session="fetch")
+            .execution_options(synchronize_session=False)
         )
+        if (
+            verify_existence
+            and model_to_retrieve is model_to_delete
+            and model_column_id is model_to_delete.id
+        ):
+            # The ids returned by the DELETE tell which ones don't exist, without any SELECT beforehand.
+            # Raising rolls the whole transaction back, the deletion included.
+            deleted = db.execute(stmt.returning(model_column_id))
+            deleted_ids = {str(deleted_id) for deleted_id in deleted.scalars()}
+            missing_ids = [
+                object_id for object_id in object_ids if str(object_id) not in deleted_ids
+            ]
+            if missing_ids:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"{model_to_delete.__tablename__} with ids {missing_ids} do not exist",
+                )
+            return
+        if verify_existence:
+            verify_existence_and_get(
+                object_ids, model=model_to_retrieve, db=db, return_model=False
+            )
         db.execute(stmt)
 
     @staticmethod
@@ -386,25 +555,8 @@ class OrmCrudSyncService:
             session.flush()
             session.commit()
         except IntegrityError as e:
-            orig = e.orig
             logger.error(str(e))
-            if isinstance(orig, errors.UniqueViolation):
-                duplicated_label = e.params.get("libelle", "")
-                raise HTTPException(
-                    status_code=status.HTTP_409_CONFLICT,
-                    detail=f"Object {db_object.__tablename__} with label {duplicated_label} already exists."
-                    f"Please try again with another label.",
-                )
-            elif isinstance(orig, errors.NotNullViolation):
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=str(e),
-                )
-            else:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail=f"Database integrity error: {str(e)}",
-                ) from e
+            raise translate_integrity_error(e, db_object.__tablename__) from e
         logger.debug(
             f"{crud_operation.value} {db_object.__tablename__} with id {db_object.id}"
         )
@@ -3,13 +3,39 @@ from typing import Union, Optional, Type
 
 import sqlalchemy as sqla
 from fastapi import HTTPException
+from opticapa_models import Alternat, Fenetre, GroupementVoies, PeriodeExclusion
+from opticapa_models.infrastructure.models.axe_ef import AxeEf
 from sqlalchemy import Column, Select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import Session, strategy_options
+from sqlalchemy.orm import Session, raiseload, selectinload, strategy_options
 from starlette import status
 
 from opticapa.shared.database.base import Base
 
+# Load options applied when retrieving whole models without load_options : the children replaced or deleted along
+# with these models by the CRUD services are loaded in one IN query instead of one lazy SELECT per object
+DEFAULT_LOAD_OPTIONS: dict[Type[Base], list[strategy_options._AbstractLoad]] = {
+    Fenetre: [selectinload(Fenetre.ressources_espace_temps)],
+    PeriodeExclusion: [selectinload(PeriodeExclusion.ressources_espace_temps)],
+    Alternat: [selectinload(Alternat.lvpks)],
+    GroupementVoies: [selectinload(GroupementVoies.lvpks)],
+    AxeEf: [selectinload(AxeEf.sections)],
+}
+
+
+def with_raiseload(
+    *loads: strategy_options._AbstractLoad,
+) -> list[strategy_options._AbstractLoad]:
+    """
+    Builds load options which load only the given relationships, any other lazy load raising an error
+    Args:
+        loads: relationships loading options to apply
+
+    Returns: the load options, to be used as load_options
+
+    """
+    return [*loads, raiseload("*")]
+
 
 def _verify_existence_and_get_stmt(
     object_id: Union[int, str, uuid.UUID, list[int], list[str], list[uuid.UUID]],
@@ -17,6 +43,7 @@ def _verify_existence_and_get_stmt(
     model_column_id: Optional[Column] = None,
     returned_column: Optional[Column] = None,
     load_options: Optional[list[strategy_options.Load]] = None,
+    existence_only: bool = False,
 ) -> (Select, bool):
     """
     this function is used to verifier if the list of object ids exsist or not and get the result of query
@@ -24,17 +51,25 @@ def _verify_existence_and_get_stmt(
         object_id: list of str or uuid
         model: database model
         model_column_id: if one wants to us a different key than id, one has to use this param
-        load_options:
+        load_options: if None, the DEFAULT_LOAD_OPTIONS of the model are applied
         returned_column: Column to return. If None, module returns the whole model
+        existence_only: if True, the query only counts the distinct matching ids instead of returning rows
 
     Returns: the result of query
 
     """
     if not model_column_id:
         model_column_id = model.id
-    stmt = sqla.select(returned_column) if returned_column else sqla.select(model)
-    if load_options:
-        stmt = stmt.options(*load_options)
+    if existence_only:
+        stmt = sqla.select(sqla.func.count(sqla.distinct(model_column_id))).select_from(
+            model
+        )
+    else:
+        stmt = sqla.select(returned_column) if returned_column else sqla.select(model)
+        if load_options is None and returned_column is None:
+            load_options = DEFAULT_LOAD_OPTIONS.get(model)
+        if load_options:
+            stmt = stmt.options(*load_options)
     if (
         isinstance(object_id, int)
         or isinstance(object_id, str)
@@ -44,6 +79,53 @@ def _verify_existence_and_get_stmt(
     return stmt.where(model_column_id.in_(object_id)), True
 
 
+def _missing_object_ids(
+    object_ids: Union[list[int], list[str], list[uuid.UUID]],
+    objects: list[Base],
+    model_column_id: Column,
+) -> Union[list[int], list[str], list[uuid.UUID]]:
+    """
+    this function is used to find the object ids which don't match any of the objects retrieved by one IN query
+    Args:
+        object_ids: list of requested ids
+        objects: objects retrieved from db
+        model_column_id: column holding the ids of the objects
+
+    Returns: the requested ids which were not retrieved
+
+    """
+    found_ids = {str(getattr(obj, model_column_id.key)) for obj in objects}
+    return [object_id for object_id in object_ids if str(object_id) not in found_ids]
+
+
+def _verify_existence_count(
+    object_id: Union[int, str, uuid.UUID, list[int], list[str], list[uuid.UUID]],
+    model: Type[Base],
+    count: int,
+    multiple_result: bool,
+):
+    """
+    this function is used to verify that the count of an existence_only query matches the requested ids
+    Args:
+        object_id: list of str or uuid
+        model: database model
+        count: number of distinct ids found in db
+        multiple_result: True if object_id is a list of ids
+
+    """
+    expected_count = len({str(_id) for _id in object_id}) if multiple_result else 1
+    if not count:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"{model.__tablename__} with id {object_id} does not exist",
+        )
+    if count < expected_count:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"{expected_count - count} {model.__tablename__} among ids {object_id} do not exist",
+        )
+
+
 def verify_existence_and_get(
     object_id: Union[int, str, uuid.UUID, list[int], list[str], list[uuid.UUID]],
     model: Type[Base],
@@ -61,7 +143,8 @@ def verify_existence_and_get(
         model_column_id: if one wants to us a different key than id, one has to use this param
         db: database
         load_options:
-        return_model: bool set to True if we want the function to return the requested result
+        return_model: bool set to True if we want the function to return the requested result. If False, the
+         existence is checked with a count query and None is returned
         returned_column: Column to return. If None, module returns the whole model
 
     Returns: the result of query
@@ -73,7 +156,17 @@ def verify_existence_and_get(
         model_column_id=model_column_id,
         returned_column=returned_column,
         load_options=load_options,
+        existence_only=not return_model,
     )
+    if not return_model:
+        # Only a count goes over the wire when the rows aren't needed
+        _verify_existence_count(
+            object_id=object_id,
+            model=model,
+            count=db.execute(stmt).scalar_one(),
+            multiple_result=multiple_result,
+        )
+        return None
     result = (
         db.execute(stmt).scalars().all()
         if multiple_result
@@ -84,7 +177,18 @@ def verify_existence_and_get(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"{model.__tablename__} with id {object_id} does not exists",
         )
-    return result if return_model else None
+    if multiple_result and returned_column is None:
+        missing_ids = _missing_object_ids(
+            object_ids=object_id,
+            objects=result,
+            model_column_id=model_column_id if model_column_id is not None else model.id,
+        )
+        if missing_ids:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"{model.__tablename__} with ids {missing_ids} do not exist",
+            )
+    return result
 
 
 async def async_verify_existence_and_get(
@@ -107,7 +211,8 @@ async def async_verify_existence_and_get(
         model_column_id: if one wants to us a different key than id, one has to use this param
         db: database
         load_options:
-        return_model: bool set to True if we want the function to return the requested result
+        return_model: bool set to True if we want the function to return the requested result. If False, the
+         existence is checked with a count query and None is returned
         returned_column: Column to return. If None, module returns the whole model
         ignore_not_found: bool set to True if we want the function to ignore not found (NONE)
 
@@ -120,7 +225,19 @@ async def async_verify_existence_and_get(
         model_column_id=model_column_id,
         returned_column=returned_column,
         load_options=load_options,
+        existence_only=not return_model,
     )
+    if not return_model:
+        # Only a count goes over the wire when the rows aren't needed
+        count = (await db.execute(stmt)).scalar_one()
+        if not ignore_not_found:
+            _verify_existence_count(
+                object_id=object_id,
+                model=model,
+                count=count,
+                multiple_result=multiple_result,
+            )
+        return None
     result = await db.execute(stmt)
     result = result.scalars().all() if multiple_result else result.scalars().first()
     if not ignore_not_found and not result:
@@ -128,4 +245,15 @@ async def async_verify_existence_and_get(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"{model.__tablename__} with id {object_id} does not exist",
         )
-    return result if return_model else None
+    if not ignore_not_found and multiple_result and returned_column is None:
+        missing_ids = _missing_object_ids(
+            object_ids=object_id,
+            objects=result,
+            model_column_id=model_column_id if model_column_id is not None else model.id,
+        )
+        if missing_ids:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"{model.__tablename__} with ids {missing_ids} do not exist",
+            )
+    return result
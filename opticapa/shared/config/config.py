@@ -1,14 +1,29 @@
 import json
 import logging
+from functools import cached_property
+from typing import NamedTuple
+from urllib.parse import urlsplit
 
 from dotenv import find_dotenv, load_dotenv
-from pydantic_settings import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
 from pytz import timezone, tzfile
 
 
+class DbParams(NamedTuple):
+    user: str
+    pwd: str
+    db_name: str
+    url: str
+    port: str
+
+
 class Settings(BaseSettings):
+    # Settings are read-only once loaded, which lets the values derived from them be cached
+    model_config = SettingsConfigDict(frozen=True, extra="ignore")
+
     loglevel: int = logging.DEBUG
     server_port: int = 8000
+    workers: int = 1
     environment: str = "develop"
     kube_namespace: str = "local"
     coac_pe_incomp: bool = True
@@ -27,6 +42,15 @@ class Settings(BaseSettings):
     db_superuser_username: str
     db_superuser_password: str
     db_statement_timeout: int = 180000  # In ms, default value is align to pods timeout
+    # Sync endpoints run in the threadpool, which is sized to db_pool_size + db_max_overflow at startup
+    db_pool_size: int = 20
+    db_max_overflow: int = 40
+    # The async pool isn't tied to the threadpool, so it keeps a small overflow. Each worker may open up to
+    # db_pool_size + db_max_overflow + db_async_pool_size + db_async_max_overflow connections : times workers, this
+    # must stay below the max_connections of the database
+    db_async_pool_size: int = 10
+    db_async_max_overflow: int = 10
+    db_pool_recycle: int = 1800  # In s
 
     fid_client_id: str
     fid_client_secret: str
@@ -57,28 +81,28 @@ class Settings(BaseSettings):
         '{"routes": [["lignes_voies", "GET"]]}'  # json format
     )
 
-    @property
+    @cached_property
     def timezone(self) -> tzfile:
         return timezone(self.timezone_name)
 
-    def db_params(self) -> dict:
-        conn_string = self.db_url.split("//")[-1].split("@")
-        user, pwd = conn_string[0].split(":")[0], conn_string[0].split(":")[1]
-        db_name = conn_string[1].split("/")[1]
-        server_url, server_port = (
-            conn_string[1].split("/")[0].split(":")[0],
-            conn_string[1].split("/")[0].split(":")[1],
-        )
-        return dict(
-            user=user, pwd=pwd, db_name=db_name, url=server_url, port=server_port
+    @cached_property
+    def db_params(self) -> DbParams:
+        # db_url may be given with or without its scheme
+        url = urlsplit("//" + self.db_url.split("//")[-1])
+        return DbParams(
+            user=url.username,
+            pwd=url.password,
+            db_name=url.path.split("/")[1],
+            url=url.hostname,
+            port=str(url.port),
         )
 
-    def datadog_routes_monitor(self) -> list[tuple[str, str]]:
-        routes = json.loads(settings.raw_datadog_routes_monitor)["routes"]
-        datadog_routes_monitor: list[tuple[str, str]] = []
-        for route_path, method in routes:
-            datadog_routes_monitor.append((route_path.lower(), method.upper()))
-        return datadog_routes_monitor
+    @cached_property
+    def datadog_routes_monitor(self) -> tuple[tuple[str, str], ...]:
+        routes = json.loads(self.raw_datadog_routes_monitor)["routes"]
+        return tuple(
+            (route_path.lower(), method.upper()) for route_path, method in routes
+        )
 
 
 load_dotenv(
@@ -1,6 +1,7 @@
 import functools
+import logging
 from asyncio import iscoroutinefunction
-from time import time
+from time import perf_counter_ns
 from typing import Callable
 from opticapa.shared.utils.logger import logger
 
@@ -9,25 +10,32 @@ def timer_func(func: Callable):
     :param func:
     :return:
     """
+    default_name = func.__name__
 
     @functools.wraps(func)
     async def async_wrapper(*args, **kwargs):
         # Suppose that `function_name` is passed as a keyword argument
-        function_name = kwargs.get("function_name", func.__name__)
-        t1 = time()
+        function_name = kwargs.get("function_name") or default_name
+        t1 = perf_counter_ns()
         result = await func(*args, **kwargs)
-        t2 = time()
-        logger.warning(f"Function {function_name!r} executed in {(t2 - t1):.4f}s")
+        t2 = perf_counter_ns()
+        if logger.isEnabledFor(logging.WARNING):
+            logger.warning(
+                f"Function {function_name!r} executed in {(t2 - t1) / 1_000_000:.3f}ms"
+            )
         return result
 
     @functools.wraps(func)
     def sync_wrapper(*args, **kwargs):
         # Suppose that `function_name` is passed as a keyword argument
-        function_name = kwargs.get("function_name", func.__name__)
-        t1 = time()
+        function_name = kwargs.get("function_name") or default_name
+        t1 = perf_counter_ns()
         result = func(*args, **kwargs)
-        t2 = time()
-        logger.warning(f"Function {function_name!r} executed in {(t2 - t1):.4f}s")
+        t2 = perf_counter_ns()
+        if logger.isEnabledFor(logging.WARNING):
+            logger.warning(
+                f"Function {function_name!r} executed in {(t2 - t1) / 1_000_000:.3f}ms"
+            )
         return result
 
     return async_wrapper if iscoroutinefunction(func) else sync_wrapper
\ No newline at end of file
@@ -1,3 +1,4 @@
+import asyncio
 import json
 from typing import Iterator, Optional, AsyncGenerator
 
@@ -16,6 +17,7 @@ from opticapa.shared.utils.logger import logger
 
 _sync_sessionmaker = None
 _async_sessionmaker = None
+_async_engine = None
 
 
 def get_async_engine(echo: bool = settings.show_logs_db_stmt) -> AsyncEngine:
@@ -24,8 +26,17 @@ def get_async_engine(echo: bool = settings.show_logs_db_stmt) -> AsyncEngine:
         json_serializer=json.dumps,
         json_deserializer=json.loads,
         echo=echo,
+        pool_size=settings.db_async_pool_size,
+        max_overflow=settings.db_async_max_overflow,
+        pool_pre_ping=True,
+        pool_recycle=settings.db_pool_recycle,
+        insertmanyvalues_page_size=1000,
         connect_args={
-            "server_settings": {"statement_timeout": f"{settings.db_statement_timeout}"}
+            "server_settings": {
+                "statement_timeout": f"{settings.db_statement_timeout}",
+                # Negotiated once per physical connection instead of a SET TIME ZONE per session
+                "TimeZone": settings.timezone_name,
+            }
         },
     )
 
@@ -36,24 +47,66 @@ def get_sync_engine(echo: bool = settings.show_logs_db_stmt) -> Engine:
         json_serializer=json.dumps,
         json_deserializer=json.loads,
         echo=echo,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_pre_ping=True,
+        pool_recycle=settings.db_pool_recycle,
+        # Multi-row INSERTs are sent as one INSERT ... VALUES per page, other executemany use psycopg2's batch helper
+        executemany_mode="values_plus_batch",
+        insertmanyvalues_page_size=1000,
+        executemany_batch_page_size=500,
         connect_args={
+            # TimeZone is negotiated once per physical connection instead of a SET TIME ZONE per session
             "options": f"-c statement_timeout={settings.db_statement_timeout}"
+            f" -c TimeZone={settings.timezone_name}"
         },
     )
 
 
+def _get_shared_async_engine() -> AsyncEngine:
+    """
+    Returns the async engine bound to the async sessions, shared with the pool warm up
+    """
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = get_async_engine()
+    return _async_engine
+
+
 def get_async_sessionmaker():
     global _async_sessionmaker
     if _async_sessionmaker is None:
         _async_sessionmaker = async_sessionmaker(
             autocommit=False,
             autoflush=False,
+            # Objects stay readable after a commit : expired attributes couldn't be lazily refreshed in async
+            expire_on_commit=False,
             class_=AsyncSession,
-            bind=get_async_engine(),
+            bind=_get_shared_async_engine(),
         )
     return _async_sessionmaker
 
 
+async def warm_up_async_pool():
+    """
+    Opens settings.db_async_pool_size connections of the async engine concurrently, so that the first requests after
+    startup don't pay the connection establishment cost. A database unavailable at startup only logs a warning.
+    """
+    engine = _get_shared_async_engine()
+
+    async def _open_connection():
+        async with engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+
+    results = await asyncio.gather(
+        *(_open_connection() for _ in range(settings.db_async_pool_size)),
+        return_exceptions=True,
+    )
+    errors = [result for result in results if isinstance(result, Exception)]
+    if errors:
+        logger.warning(f"Async connection pool warm up failed: {errors[0]}")
+
+
 def get_sync_sessionmaker():
     global _sync_sessionmaker
     if _sync_sessionmaker is None:
@@ -66,36 +119,9 @@ def get_sync_sessionmaker():
     return _sync_sessionmaker
 
 
-def set_default_timezone(session: Session, timezone_name: str = settings.timezone_name):
-    """
-    This statement sets a default timezone in a session
-    Args:
-        session: DB session
-        timezone_name: str: default timezone to set
-    """
-    session.execute(text(f"""SET TIME ZONE '{timezone_name}';"""))
-    timezone = session.execute(text("""SHOW TIME ZONE;""")).fetchone()[0]
-    logger.debug(f"Session default timezone set to {timezone}")
-
-
-async def async_set_default_timezone(
-    session: AsyncSession, timezone_name: str = settings.timezone_name
-):
-    """
-    This statement sets a default timezone in a session
-    Args:
-        session: DB session
-        timezone_name: str: default timezone to set
-    """
-    await session.execute(text(f"""SET TIME ZONE '{timezone_name}';"""))
-    timezone = await session.execute(text("""SHOW TIME ZONE;"""))
-    logger.debug(f"Session default timezone set to {timezone.fetchone()[0]}")
-
-
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
     async_session = get_async_sessionmaker()
     async with async_session() as session:
-        await async_set_default_timezone(session)
         try:
             yield session
         except Exception:
@@ -108,7 +134,6 @@ async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
 def get_sync_session() -> Iterator[Session]:
     sync_session = get_sync_sessionmaker()
     db_session = sync_session()
-    set_default_timezone(db_session)
     try:
         yield db_session
     except Exception:
@@ -0,0 +1,23 @@
+import os
+
+# Settings are loaded at import time : required settings get dummy values so that the app can be imported in tests
+for setting, value in {
+    "DB_URL": "user:password@localhost:5432/opticapa",
+    "DB_SUPERUSER_USERNAME": "postgres",
+    "DB_SUPERUSER_PASSWORD": "postgres",
+    "FID_CLIENT_ID": "test",
+    "FID_CLIENT_SECRET": "test",
+    "FID_ISSUER": "test",
+    "FID_DISCOVERY_URL": "http://localhost",
+    "FID_REDIRECT_URL": "http://localhost",
+    "JWT_SECRET_KEY": "test",
+    "JWT_REFRESH_SECRET_KEY": "test",
+    "ALGORITHM": "HS256",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "30",
+    "REFRESH_TOKEN_EXPIRE_MINUTES": "60",
+    "API_TO_API_TOKEN_EXPIRE_MINUTES": "30",
+    "FID": "test",
+    "FID_CERTIFICATE": "test",
+    "FRONTEND_URL": "http://localhost:4200",
+}.items():
+    os.environ.setdefault(setting, value)
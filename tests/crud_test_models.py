@@ -0,0 +1,50 @@
+from sqlalchemy import JSON, Column, ForeignKey, Integer, String, Table
+from sqlalchemy.orm import declarative_base, relationship
+
+# Models of the tables created in the test database by the db_engine fixture of the crud services tests
+CrudTestBase = declarative_base()
+
+crud_parent_section = Table(
+    "crud_test_parent_section",
+    CrudTestBase.metadata,
+    Column(
+        "parent_id",
+        Integer,
+        ForeignKey("crud_test_parent.id", ondelete="CASCADE"),
+        primary_key=True,
+    ),
+    Column("section_id", Integer, ForeignKey("crud_test_section.id"), primary_key=True),
+)
+
+
+class CrudParent(CrudTestBase):
+    __tablename__ = "crud_test_parent"
+
+    id = Column(Integer, primary_key=True)
+    libelle = Column(String, nullable=False, unique=True)
+    commentaire = Column(String, server_default="default")
+
+    children = relationship("CrudChild", back_populates="parent")
+    sections = relationship("CrudSection", secondary=crud_parent_section)
+
+
+class CrudChild(CrudTestBase):
+    __tablename__ = "crud_test_child"
+
+    id = Column(Integer, primary_key=True)
+    parent_id = Column(
+        Integer, ForeignKey(CrudParent.id, ondelete="CASCADE"), nullable=False
+    )
+    libelle = Column(String, nullable=False)
+    commentaire = Column(String, server_default="default")
+
+    parent = relationship(CrudParent, back_populates="children")
+
+
+class CrudSection(CrudTestBase):
+    __tablename__ = "crud_test_section"
+
+    id = Column(Integer, primary_key=True)
+    libelle = Column(String, nullable=False)
+    code = Column(String, default="code")
+    payload = Column(JSON)
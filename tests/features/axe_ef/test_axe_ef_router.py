@@ -0,0 +1,122 @@
+import uuid
+
+import jwt
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from opticapa.features.axe_ef.router import axe_ef_router
+from opticapa.features.axe_ef.service import AxeEfService
+from opticapa.shared.config.config import settings
+from opticapa.shared.database.manage_db import get_async_session, get_sync_session
+
+EMPTY_PAGE = '{"items":[],"has_next":false,"count":null,"next_cursor":null}'
+
+
+@pytest.fixture
+def service_calls(monkeypatch) -> list[dict]:
+    calls = []
+
+    def get_all_axes_ef_json(**kwargs):
+        calls.append(kwargs)
+        return EMPTY_PAGE
+
+    monkeypatch.setattr(AxeEfService, "get_all_axes_ef_json", get_all_axes_ef_json)
+    return calls
+
+
+@pytest.fixture
+def client() -> TestClient:
+    app = FastAPI()
+    app.include_router(axe_ef_router)
+    app.dependency_overrides[get_sync_session] = lambda: None
+    app.dependency_overrides[get_async_session] = lambda: None
+    return TestClient(app)
+
+
+def test_get_all_paginated_axes_ef_by_offset(client, service_calls):
+    response = client.get(
+        "/axe_ef/all/", params={"limit": 10, "offset": 20, "include_total": True}
+    )
+
+    assert response.status_code == 200
+    assert response.text == EMPTY_PAGE
+    [call] = service_calls
+    assert call["pagination_params"].limit == 10
+    assert call["pagination_params"].offset == 20
+    assert call["after_libelle"] is None
+    assert call["after_id"] is None
+    assert call["include_total"] is True
+
+
+def test_get_all_paginated_axes_ef_by_keyset(client, service_calls):
+    after_id = uuid.uuid4()
+
+    response = client.get(
+        "/axe_ef/all/", params={"after_libelle": "Axe 1", "after_id": str(after_id)}
+    )
+
+    assert response.status_code == 200
+    [call] = service_calls
+    assert call["pagination_params"].limit == 25
+    assert call["after_libelle"] == "Axe 1"
+    assert call["after_id"] == after_id
+    assert call["include_total"] is False
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {"after_libelle": "Axe 1"},
+        {"after_id": str(uuid.uuid4())},
+        {"limit": 0},
+        {"limit": 1001},
+        {"offset": -1},
+    ],
+)
+def test_get_all_paginated_axes_ef_invalid_params(client, service_calls, params):
+    response = client.get("/axe_ef/all/", params=params)
+
+    assert response.status_code == 422
+    assert service_calls == []
+
+
+@pytest.fixture
+def renew_calls(monkeypatch) -> list[dict]:
+    calls = []
+
+    async def renew_axe_ef(**kwargs):
+        calls.append(kwargs)
+        return {"created": str(uuid.uuid4())}
+
+    monkeypatch.setattr(AxeEfService, "renew_axe_ef", renew_axe_ef)
+    return calls
+
+
+def test_renew_axe_ef_passes_current_user(client, renew_calls):
+    token = jwt.encode({"sub": "42"}, settings.jwt_secret_key, algorithm=settings.algorithm)
+
+    response = client.post(
+        "/axe_ef/renew/axe-1",
+        params={"service_annuel_id": "sa-2"},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 200
+    [call] = renew_calls
+    assert call["axe_ef_id"] == "axe-1"
+    assert call["service_annuel_id"] == "sa-2"
+    assert call["user_id"] == 42
+
+
+def test_renew_axe_ef_rejects_invalid_token(client, renew_calls):
+    token = jwt.encode({"sub": "42"}, "another secret", algorithm=settings.algorithm)
+
+    response = client.post(
+        "/axe_ef/renew/axe-1",
+        params={"service_annuel_id": "sa-2"},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 401
+    assert renew_calls == []
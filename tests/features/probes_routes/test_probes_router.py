@@ -0,0 +1,31 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from opticapa.main import app
+
+
+@pytest.fixture
+def client() -> TestClient:
+    return TestClient(app)
+
+
+# Liveness and readiness probes target the root paths, the frontend the /api ones
+# Trailing slash paths are served as well : probes don't all follow redirections
+@pytest.mark.parametrize(
+    "path",
+    [
+        "/health",
+        "/health/",
+        "/ready",
+        "/ready/",
+        "/api/health",
+        "/api/health/",
+        "/api/ready",
+        "/api/ready/",
+    ],
+)
+def test_probes(client, path):
+    response = client.get(path, follow_redirects=False)
+
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok"}
@@ -0,0 +1,103 @@
+import pytest
+import sqlalchemy as sqla
+from fastapi import HTTPException
+
+from crud_test_models import CrudChild, CrudParent
+from opticapa.shared.common.service.crud.crud_async_service import (
+    OrmCrudAsyncService,
+)
+
+
+@pytest.mark.asyncio
+async def test_multiple_insert_procedure_sends_one_insert_per_model(
+    async_db_session, async_executed_statements
+):
+    ids = await OrmCrudAsyncService.multiple_insert_procedure(
+        session=async_db_session,
+        main_model=CrudParent,
+        object_to_insert=[
+            {
+                "id": index,
+                "libelle": f"parent {index}",
+                "children": [
+                    {
+                        "parent_id": index,
+                        "libelle": f"child {index}",
+                        "commentaire": None,
+                    }
+                ],
+            }
+            for index in range(1, 101)
+        ],
+        sub_object_models={"children": CrudChild},
+    )
+    await async_db_session.commit()
+
+    assert ids == list(range(1, 101))
+    assert len(async_executed_statements) == 2
+    children = await async_db_session.execute(
+        sqla.select(CrudChild.parent_id, CrudChild.commentaire).order_by(CrudChild.id)
+    )
+    # None is inserted as NULL, not replaced by the server default
+    assert children.all() == [(index, None) for index in range(1, 101)]
+
+
+@pytest.mark.asyncio
+async def test_upsert_procedure_creates_single_object_with_one_insert_per_model(
+    async_db_session, async_executed_statements
+):
+    await OrmCrudAsyncService.upsert_procedure(
+        session=async_db_session,
+        main_model=CrudParent,
+        object_to_insert={"libelle": "parent", "children": []},
+        sub_object_models={"children": CrudChild},
+    )
+
+    # 1 + len(sub_object_models) statements at most, empty sub objects not being inserted
+    assert len(async_executed_statements) == 1
+    libelles = await async_db_session.scalars(sqla.select(CrudParent.libelle))
+    assert libelles.all() == ["parent"]
+
+
+@pytest.mark.asyncio
+async def test_delete_object_verifies_ids_with_returning(
+    async_db_session, async_executed_statements
+):
+    await OrmCrudAsyncService.multiple_insert_procedure(
+        session=async_db_session,
+        main_model=CrudParent,
+        object_to_insert=[{"id": index, "libelle": f"parent {index}"} for index in (1, 2)],
+        sub_object_models={},
+    )
+    await async_db_session.commit()
+    async_executed_statements.clear()
+
+    await OrmCrudAsyncService.delete_object(
+        object_ids=[],
+        model_to_delete=CrudParent,
+        model_to_retrieve=CrudParent,
+        db=async_db_session,
+    )
+    assert async_executed_statements == []
+
+    await OrmCrudAsyncService.delete_object(
+        object_ids=[2],
+        model_to_delete=CrudParent,
+        model_to_retrieve=CrudParent,
+        db=async_db_session,
+    )
+    await async_db_session.commit()
+    [statement] = async_executed_statements
+    assert statement.startswith("DELETE") and "RETURNING" in statement
+
+    with pytest.raises(HTTPException) as error:
+        await OrmCrudAsyncService.delete_object(
+            object_ids=[1, 2],
+            model_to_delete=CrudParent,
+            model_to_retrieve=CrudParent,
+            db=async_db_session,
+        )
+    await async_db_session.rollback()
+    assert error.value.detail == "crud_test_parent with ids [2] do not exist"
+    ids = await async_db_session.scalars(sqla.select(CrudParent.id))
+    assert ids.all() == [1]
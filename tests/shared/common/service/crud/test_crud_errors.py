@@ -0,0 +1,48 @@
+import pytest
+from fastapi import HTTPException
+
+from crud_test_models import CrudParent
+from opticapa.shared.common.service.crud.crud_async_service import (
+    OrmCrudAsyncService,
+)
+from opticapa.shared.common.service.crud.crud_statements import build_insert_stmt
+from opticapa.shared.common.service.crud.crud_sync_service import OrmCrudSyncService
+
+DUPLICATED_ROWS = [
+    {"id": 1, "libelle": "parent 1"},
+    {"id": 2, "libelle": "parent 2"},
+    {"id": 3, "libelle": "parent 1"},
+]
+
+
+def test_unique_violation_names_duplicated_key(db_session):
+    with pytest.raises(HTTPException) as error:
+        OrmCrudSyncService.execute_stmt(
+            session=db_session,
+            stmt=build_insert_stmt(main_model=CrudParent, columns=["id", "libelle"]),
+            main_model=CrudParent,
+            params=DUPLICATED_ROWS,
+        )
+
+    assert error.value.status_code == 409
+    assert error.value.detail == (
+        "Object crud_test_parent with libelle parent 1 already exists. "
+        "Please try again with another label."
+    )
+
+
+@pytest.mark.asyncio
+async def test_async_unique_violation_names_duplicated_key(async_db_session):
+    with pytest.raises(HTTPException) as error:
+        await OrmCrudAsyncService.execute_stmt(
+            session=async_db_session,
+            stmt=build_insert_stmt(main_model=CrudParent, columns=["id", "libelle"]),
+            main_model=CrudParent,
+            params=DUPLICATED_ROWS,
+        )
+
+    assert error.value.status_code == 409
+    assert error.value.detail == (
+        "Object crud_test_parent with libelle parent 1 already exists. "
+        "Please try again with another label."
+    )
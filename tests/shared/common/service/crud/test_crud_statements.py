@@ -0,0 +1,125 @@
+import sqlalchemy as sqla
+
+from crud_test_models import CrudChild, CrudParent, CrudSection, crud_parent_section
+from opticapa.shared.common.service.crud import crud_statements
+from opticapa.shared.common.service.crud.crud_statements import group_insert_rows
+from opticapa.shared.common.service.crud.crud_sync_service import OrmCrudSyncService
+
+
+def test_group_insert_rows_by_columns():
+    rows = [{"id": 1, "a": 1}, {"id": 2, "a": 2, "b": 3}, {"a": 4}, {"id": 3, "a": 5}]
+
+    groups = group_insert_rows(rows=rows)
+
+    assert groups == {
+        frozenset({"id", "a"}): [0, 3],
+        frozenset({"id", "a", "b"}): [1],
+        frozenset({"a"}): [2],
+    }
+
+
+def test_group_insert_rows_keeps_last_duplicated_id_when_upserting():
+    rows = [{"id": 1, "a": 1}, {"a": 2}, {"id": 1, "a": 3}, {"a": 4}]
+
+    assert group_insert_rows(rows=rows, do_update=True) == {
+        frozenset({"id", "a"}): [2],
+        frozenset({"a"}): [1, 3],
+    }
+    assert group_insert_rows(rows=rows, do_update=False) == {
+        frozenset({"id", "a"}): [0, 2],
+        frozenset({"a"}): [1, 3],
+    }
+
+
+def _statement_verbs(statements: list[str]) -> list[str]:
+    return [statement.split()[0] for statement in statements]
+
+
+def test_update_procedure_replaces_children(
+    db_session, executed_statements, monkeypatch
+):
+    monkeypatch.setitem(crud_statements._REPLACED_COLLECTIONS, CrudParent, "children")
+    db_session.add(
+        CrudParent(id=1, libelle="parent", children=[CrudChild(libelle="old")])
+    )
+    db_session.commit()
+    obj_to_update = db_session.get(CrudParent, 1)
+    executed_statements.clear()
+
+    OrmCrudSyncService.update_procedure(
+        db_object=CrudParent(
+            libelle="updated",
+            children=[
+                CrudChild(libelle="new", commentaire=None),
+                CrudChild(libelle="new bis"),
+            ],
+        ),
+        obj_to_update=obj_to_update,
+        session=db_session,
+    )
+
+    # Children with different sets of columns are inserted by different statements
+    assert _statement_verbs(executed_statements) == [
+        "DELETE",
+        "UPDATE",
+        "INSERT",
+        "INSERT",
+    ]
+    assert db_session.execute(
+        sqla.select(CrudParent.id, CrudParent.libelle, CrudParent.commentaire)
+    ).all() == [(1, "updated", "default")]
+    assert db_session.execute(
+        sqla.select(CrudChild.parent_id, CrudChild.libelle, CrudChild.commentaire)
+        .order_by(CrudChild.libelle)
+    ).all() == [(1, "new", None), (1, "new bis", "default")]
+
+
+def test_update_procedure_replaces_association_rows(
+    db_session, executed_statements, monkeypatch
+):
+    monkeypatch.setitem(crud_statements._REPLACED_COLLECTIONS, CrudParent, "sections")
+    sections = [CrudSection(id=index, libelle=f"section {index}") for index in (1, 2, 3)]
+    db_session.add_all(
+        [*sections, CrudParent(id=1, libelle="parent", sections=sections[:1])]
+    )
+    db_session.commit()
+    obj_to_update = db_session.get(CrudParent, 1)
+    executed_statements.clear()
+
+    OrmCrudSyncService.update_procedure(
+        db_object=CrudParent(
+            libelle="parent",
+            sections=[CrudSection(id=2), CrudSection(id=3)],
+        ),
+        obj_to_update=obj_to_update,
+        session=db_session,
+    )
+
+    assert _statement_verbs(executed_statements) == ["DELETE", "UPDATE", "INSERT"]
+    assert db_session.execute(
+        sqla.select(crud_parent_section).order_by(crud_parent_section.c.section_id)
+    ).all() == [(1, 2), (1, 3)]
+    # Only the rows of the association table are replaced, not the sections themselves
+    assert db_session.scalars(
+        sqla.select(CrudSection.libelle).order_by(CrudSection.id)
+    ).all() == ["section 1", "section 2", "section 3"]
+
+
+def test_update_procedure_without_replaced_collection(
+    db_session, executed_statements
+):
+    db_session.add(CrudParent(id=1, libelle="parent"))
+    db_session.commit()
+    obj_to_update = db_session.get(CrudParent, 1)
+    executed_statements.clear()
+
+    OrmCrudSyncService.update_procedure(
+        db_object=CrudParent(libelle="updated", commentaire=None),
+        obj_to_update=obj_to_update,
+        session=db_session,
+    )
+
+    assert _statement_verbs(executed_statements) == ["UPDATE"]
+    assert db_session.execute(
+        sqla.select(CrudParent.libelle, CrudParent.commentaire)
+    ).all() == [("updated", None)]
@@ -0,0 +1,266 @@
+import pytest
+import sqlalchemy as sqla
+from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
+
+from crud_test_models import CrudChild, CrudParent, CrudSection
+from opticapa.shared.common.service.crud.crud_sync_service import (
+    _COPY_MIN_ROWS,
+    OrmCrudSyncService,
+    _copy_sub_objects,
+)
+
+
+def _parents(count: int, libelle: str = "parent") -> list[dict]:
+    return [
+        {
+            "id": index,
+            "libelle": f"{libelle} {index}",
+            "children": [
+                {"parent_id": index, "libelle": f"child {index}", "commentaire": None},
+                {
+                    "parent_id": index,
+                    "libelle": f"child {index} bis",
+                    "commentaire": "",
+                },
+            ],
+        }
+        for index in range(1, count + 1)
+    ]
+
+
+def test_multiple_insert_procedure_sends_one_insert_per_model(
+    db_session, executed_statements
+):
+    ids = OrmCrudSyncService.multiple_insert_procedure(
+        session=db_session,
+        main_model=CrudParent,
+        object_to_insert=_parents(100),
+        sub_object_models={"children": CrudChild},
+    )
+    db_session.commit()
+
+    assert ids == list(range(1, 101))
+    assert len(executed_statements) == 2
+    children = db_session.execute(
+        sqla.select(CrudChild.parent_id, CrudChild.libelle, CrudChild.commentaire)
+        .where(CrudChild.parent_id == 1)
+        .order_by(CrudChild.id)
+    ).all()
+    # None is inserted as NULL, not replaced by the server default
+    assert children == [(1, "child 1", None), (1, "child 1 bis", "")]
+
+
+def test_multiple_insert_procedure_upserts_with_one_statement(
+    db_session, executed_statements
+):
+    OrmCrudSyncService.multiple_insert_procedure(
+        session=db_session,
+        main_model=CrudParent,
+        object_to_insert=_parents(100),
+        sub_object_models={},
+    )
+    db_session.commit()
+    executed_statements.clear()
+
+    ids = OrmCrudSyncService.multiple_insert_procedure(
+        session=db_session,
+        main_model=CrudParent,
+        object_to_insert=[
+            {"id": index, "libelle": f"updated {index}"} for index in range(1, 101)
+        ],
+        sub_object_models={},
+        do_update=True,
+    )
+    db_session.commit()
+
+    assert ids == list(range(1, 101))
+    assert len(executed_statements) == 1
+    assert db_session.scalars(
+        sqla.select(CrudParent.libelle).order_by(CrudParent.id).limit(2)
+    ).all() == ["updated 1", "updated 2"]
+
+
+def test_multiple_insert_procedure_returns_generated_ids_in_order(db_session):
+    ids = OrmCrudSyncService.multiple_insert_procedure(
+        session=db_session,
+        main_model=CrudParent,
+        object_to_insert=[{"libelle": f"parent {index}"} for index in range(3)],
+        sub_object_models={},
+    )
+    db_session.commit()
+
+    assert dict(
+        db_session.execute(sqla.select(CrudParent.id, CrudParent.libelle)).all()
+    ) == {ids[0]: "parent 0", ids[1]: "parent 1", ids[2]: "parent 2"}
+
+
+def test_upsert_procedure_creates_single_object_with_one_insert_per_model(
+    db_session, executed_statements
+):
+    OrmCrudSyncService.upsert_procedure(
+        session=db_session,
+        main_model=CrudParent,
+        object_to_insert=_parents(1)[0],
+        sub_object_models={"children": CrudChild},
+    )
+
+    # 1 + len(sub_object_models) statements, the objects being inserted with their id
+    assert len(executed_statements) == 2
+    assert db_session.execute(
+        sqla.select(CrudParent.id, CrudParent.libelle, CrudParent.commentaire)
+    ).all() == [(1, "parent 1", "default")]
+    assert db_session.scalars(
+        sqla.select(CrudChild.libelle).order_by(CrudChild.id)
+    ).all() == ["child 1", "child 1 bis"]
+
+
+def test_upsert_procedure_creates_object_list_with_one_insert_per_model(
+    db_session, executed_statements
+):
+    OrmCrudSyncService.upsert_procedure(
+        session=db_session,
+        main_model=CrudParent,
+        object_to_insert=_parents(10),
+        sub_object_models={"children": CrudChild},
+    )
+
+    assert len(executed_statements) == 2
+    assert db_session.scalar(sqla.select(sqla.func.count(CrudChild.id))) == 20
+
+
+@pytest.fixture
+def inserted_parents(db_session) -> list[dict]:
+    parents = _parents(3)
+    OrmCrudSyncService.multiple_insert_procedure(
+        session=db_session,
+        main_model=CrudParent,
+        object_to_insert=parents,
+        sub_object_models={"children": CrudChild},
+    )
+    db_session.commit()
+    return parents
+
+
+def test_delete_object_verifies_ids_with_returning(
+    db_session, inserted_parents, executed_statements
+):
+    OrmCrudSyncService.delete_object(
+        object_ids=[1, "3"],
+        model_to_delete=CrudParent,
+        model_to_retrieve=CrudParent,
+        db=db_session,
+    )
+    db_session.commit()
+
+    [statement] = executed_statements
+    assert statement.startswith("DELETE") and "RETURNING" in statement
+    assert db_session.scalars(sqla.select(CrudParent.id)).all() == [2]
+
+
+def test_delete_object_rolls_back_on_missing_ids(db_session, inserted_parents):
+    with pytest.raises(HTTPException) as error:
+        OrmCrudSyncService.delete_object(
+            object_ids=[1, 5],
+            model_to_delete=CrudParent,
+            model_to_retrieve=CrudParent,
+            db=db_session,
+        )
+    db_session.rollback()
+
+    assert error.value.status_code == 404
+    assert error.value.detail == "crud_test_parent with ids [5] do not exist"
+    assert db_session.scalars(
+        sqla.select(CrudParent.id).order_by(CrudParent.id)
+    ).all() == [1, 2, 3]
+
+
+def test_delete_object_by_parent_column_verifies_parents_first(
+    db_session, inserted_parents, executed_statements
+):
+    OrmCrudSyncService.delete_object(
+        object_ids=[2],
+        model_to_delete=CrudChild,
+        model_to_retrieve=CrudParent,
+        db=db_session,
+        model_column_id=CrudChild.parent_id,
+    )
+    db_session.commit()
+
+    assert [statement.split()[0] for statement in executed_statements] == [
+        "SELECT",
+        "DELETE",
+    ]
+    assert db_session.scalars(
+        sqla.select(CrudChild.parent_id).distinct().order_by(CrudChild.parent_id)
+    ).all() == [1, 3]
+
+
+def test_delete_object_without_ids_sends_nothing(
+    db_session, inserted_parents, executed_statements
+):
+    OrmCrudSyncService.delete_object(
+        object_ids=[],
+        model_to_delete=CrudParent,
+        model_to_retrieve=CrudParent,
+        db=db_session,
+    )
+
+    assert executed_statements == []
+
+
+def test_insert_sub_objects_copies_many_rows(db_session, executed_statements):
+    db_session.add(CrudParent(id=1, libelle="parent"))
+    db_session.flush()
+    executed_statements.clear()
+    children = [
+        {"parent_id": 1, "libelle": f"child {index}", "commentaire": comment}
+        for index in range(_COPY_MIN_ROWS)
+        for comment in (None, "", 'with "quotes", commas\nand new line')
+    ]
+
+    OrmCrudSyncService._insert_sub_objects(
+        session=db_session, model=CrudChild, objs=children
+    )
+    db_session.commit()
+
+    # COPY doesn't go through the cursor of SQLAlchemy
+    assert executed_statements == []
+    # An unquoted empty field is NULL, a quoted one an empty string
+    assert db_session.execute(
+        sqla.select(CrudChild.commentaire, sqla.func.count())
+        .group_by(CrudChild.commentaire)
+        .order_by(CrudChild.commentaire.nulls_first())
+    ).all() == [
+        (None, _COPY_MIN_ROWS),
+        ("", _COPY_MIN_ROWS),
+        ('with "quotes", commas\nand new line', _COPY_MIN_ROWS),
+    ]
+
+
+@pytest.mark.parametrize(
+    "model, objs",
+    [
+        # Not the same keys in all rows
+        (CrudChild, [{"parent_id": 1, "libelle": "a"}, {"parent_id": 1}]),
+        # Key which isn't a column of the table
+        (CrudChild, [{"parent_id": 1, "libelle": "a", "parent": None}]),
+        # Value which isn't a scalar
+        (CrudSection, [{"id": 1, "libelle": "a", "code": ["a"]}]),
+        # Column type processing the values bound to it
+        (CrudSection, [{"id": 1, "libelle": "a", "code": "a", "payload": None}]),
+        # Missing column with a python side default
+        (CrudSection, [{"id": 1, "libelle": "a"}]),
+    ],
+)
+def test_copy_sub_objects_falls_back(db_session, model, objs):
+    assert not _copy_sub_objects(session=db_session, model=model, objs=objs)
+
+
+def test_copy_sub_objects_raises_integrity_errors(db_session):
+    with pytest.raises(IntegrityError):
+        _copy_sub_objects(
+            session=db_session,
+            model=CrudChild,
+            objs=[{"parent_id": 1, "libelle": "child of a missing parent"}],
+        )
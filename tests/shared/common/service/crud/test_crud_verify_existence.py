@@ -0,0 +1,124 @@
+import pytest
+from fastapi import HTTPException
+
+from crud_test_models import CrudChild, CrudParent
+from opticapa.shared.common.service.crud.crud_verify_existence import (
+    _missing_object_ids,
+    async_verify_existence_and_get,
+    verify_existence_and_get,
+)
+
+
+@pytest.fixture
+def parents(db_session) -> list[CrudParent]:
+    parents = [
+        CrudParent(
+            id=index,
+            libelle=f"parent {index}",
+            children=[CrudChild(libelle="child"), CrudChild(libelle="child bis")],
+        )
+        for index in (1, 2, 3)
+    ]
+    db_session.add_all(parents)
+    db_session.commit()
+    return parents
+
+
+def test_missing_object_ids_compares_ids_as_strings():
+    objects = [CrudParent(id=1), CrudParent(id=2)]
+
+    assert _missing_object_ids(
+        object_ids=[1, "2", 3], objects=objects, model_column_id=CrudParent.id
+    ) == [3]
+
+
+def test_existence_only_counts_distinct_ids(db_session, parents, executed_statements):
+    assert (
+        verify_existence_and_get(
+            [1, 2, 2, "3"], model=CrudParent, db=db_session, return_model=False
+        )
+        is None
+    )
+
+    [statement] = executed_statements
+    assert "count(DISTINCT crud_test_parent.id)" in statement
+
+
+def test_existence_only_counts_distinct_foreign_keys(
+    db_session, parents, executed_statements
+):
+    # Each parent has two children : the count is made on the distinct parent ids
+    verify_existence_and_get(
+        [1, 2],
+        model=CrudChild,
+        db=db_session,
+        model_column_id=CrudChild.parent_id,
+        return_model=False,
+    )
+
+    assert len(executed_statements) == 1
+
+
+def test_existence_only_raises_on_missing_ids(db_session, parents):
+    with pytest.raises(HTTPException) as error:
+        verify_existence_and_get(
+            [1, 2, 5], model=CrudParent, db=db_session, return_model=False
+        )
+
+    assert error.value.status_code == 404
+    assert error.value.detail == "1 crud_test_parent among ids [1, 2, 5] do not exist"
+
+
+def test_existence_only_raises_when_no_id_exists(db_session, parents):
+    with pytest.raises(HTTPException) as error:
+        verify_existence_and_get(5, model=CrudParent, db=db_session, return_model=False)
+
+    assert error.value.status_code == 404
+    assert error.value.detail == "crud_test_parent with id 5 does not exist"
+
+
+def test_verify_existence_and_get_returns_objects_with_one_query(
+    db_session, parents, executed_statements
+):
+    result = verify_existence_and_get([3, 1], model=CrudParent, db=db_session)
+
+    assert len(executed_statements) == 1
+    assert sorted(parent.libelle for parent in result) == ["parent 1", "parent 3"]
+
+
+def test_verify_existence_and_get_raises_on_missing_ids(db_session, parents):
+    with pytest.raises(HTTPException) as error:
+        verify_existence_and_get([1, 5, 2, 6], model=CrudParent, db=db_session)
+
+    assert error.value.status_code == 404
+    assert error.value.detail == "crud_test_parent with ids [5, 6] do not exist"
+
+
+@pytest.mark.asyncio
+async def test_async_existence_only_counts_distinct_ids(
+    async_db_session, parents, async_executed_statements
+):
+    assert (
+        await async_verify_existence_and_get(
+            [1, 2, 2], model=CrudParent, db=async_db_session, return_model=False
+        )
+        is None
+    )
+    with pytest.raises(HTTPException) as error:
+        await async_verify_existence_and_get(
+            [1, 5], model=CrudParent, db=async_db_session, return_model=False
+        )
+
+    assert error.value.detail == "1 crud_test_parent among ids [1, 5] do not exist"
+    assert len(async_executed_statements) == 2
+    # Missing ids are ignored on demand
+    assert (
+        await async_verify_existence_and_get(
+            [5],
+            model=CrudParent,
+            db=async_db_session,
+            return_model=False,
+            ignore_not_found=True,
+        )
+        is None
+    )